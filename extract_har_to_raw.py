@@ -1,26 +1,42 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import argparse
 import base64
 import json
 import mimetypes
+import os
 import re
 import sys
 from collections import Counter, deque
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from hashlib import sha1
 from html.parser import HTMLParser
 from pathlib import Path
 from typing import Iterable
-from urllib.parse import urljoin, urlsplit, urlunsplit
 from urllib.request import Request, urlopen
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "tools" / "zcfindia_crawl"))
+import urls  # noqa: E402
+from extract_cache import ExtractCache, extractor_version  # noqa: E402
+from urls import (  # noqa: E402
+    UrlTable,
+    canonical_route_path,
+    join_url,
+    normalize_base_url,
+    path_suffix,
+    split_url,
+    strip_fragment,
+    url_to_rel_path,
+)
+from warc import WarcWriter  # noqa: E402
+
 
 HAR_GLOB = "*.har"
 RAW_DIR = Path("raw")
 MAX_CRAWL_PAGES = 60
 HTTP_TIMEOUT = 25
+CHECKPOINT_EVERY = 25
 
 SKIP_ROUTE_EXTENSIONS = {
     ".jpg",
@@ -56,54 +72,6 @@ def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def safe_segment(value: str) -> str:
-    value = value.strip()
-    if not value:
-        return "_"
-    value = re.sub(r"[^A-Za-z0-9._-]+", "_", value)
-    return value[:180] or "_"
-
-
-def split_url(url: str):
-    return urlsplit(url)
-
-
-def normalize_base_url(url: str) -> str:
-    parsed = split_url(url)
-    scheme = "https"
-    netloc = parsed.netloc.lower()
-    path = parsed.path or "/"
-    if "." not in Path(path).name and not path.endswith("/"):
-        path += "/"
-    return urlunsplit((scheme, netloc, path, "", ""))
-
-
-def canonical_route_path(url: str) -> str:
-    parsed = split_url(url)
-    path = parsed.path or "/"
-    if "." not in Path(path).name and not path.endswith("/"):
-        path += "/"
-    return path
-
-
-def url_to_rel_path(url: str, default_ext: str | None = None) -> Path:
-    parsed = split_url(url)
-    host = safe_segment(parsed.netloc.lower() or "unknown_host")
-    path = parsed.path or "/"
-    if path.endswith("/"):
-        path = f"{path}index"
-    p = Path(path.lstrip("/"))
-    if not p.name:
-        p = Path("index")
-    suffix = p.suffix
-    if not suffix and default_ext:
-        p = p.with_suffix(default_ext)
-    if parsed.query:
-        q_hash = sha1(parsed.query.encode("utf-8")).hexdigest()[:8]
-        p = p.with_name(f"{safe_segment(p.stem)}__q_{q_hash}{p.suffix}")
-    return Path(host) / p
-
-
 def guess_ext_from_mime(mime: str) -> str | None:
     if not mime:
         return None
@@ -158,14 +126,9 @@ class HTMLCollector(HTMLParser):
         def _add_url(raw: str | None, out: set[str]) -> None:
             if not raw:
                 return
-            joined = urljoin(self.base_url, raw.strip())
-            parsed = split_url(joined)
-            if parsed.scheme not in {"http", "https"}:
-                return
-            normalized = urlunsplit(
-                (parsed.scheme, parsed.netloc, parsed.path or "/", parsed.query, "")
-            )
-            out.add(normalized)
+            normalized = strip_fragment(join_url(self.base_url, raw.strip()))
+            if normalized is not None:
+                out.add(normalized)
 
         if tag == "a":
             _add_url(attr.get("href"), self.links)
@@ -198,6 +161,131 @@ class HTMLCollector(HTMLParser):
         return "\n".join(self._text_parts)
 
 
+COLLECTOR_VERSION = extractor_version(HTMLCollector, urls)
+
+
+def collect_html(html: str, base_url: str, cache: ExtractCache | None = None) -> dict:
+    # {"text", "links", "assets"} for a page; served from the extraction
+    # cache when this exact HTML was already parsed by this HTMLCollector.
+    def parse() -> dict:
+        collector = HTMLCollector(base_url)
+        collector.feed(html)
+        return {
+            "text": collector.text,
+            "links": sorted(collector.links),
+            "assets": sorted(collector.assets),
+        }
+
+    if cache is None:
+        return parse()
+    return cache.get_or_extract("collector", COLLECTOR_VERSION, base_url, html, parse)
+
+
+# Manifest records are appended to <name>.ndjson as they are produced and
+# fsynced every `checkpoint_every` records, so a crash leaves the partial log
+# plus <name>.checkpoint.json on disk. finalize() renders the pretty manifest.
+# A run rebuilds its manifests from the HARs, so a log left by a crashed run
+# is moved aside to <name>.crashed.ndjson (with its checkpoint) rather than
+# appended to or overwritten.
+class RecordSink:
+    def __init__(self, manifest: Path, checkpoint_every: int = CHECKPOINT_EVERY):
+        self.manifest = manifest
+        self.stream_path = manifest.with_suffix(".ndjson")
+        self.checkpoint_path = manifest.with_suffix(".checkpoint.json")
+        self.checkpoint_every = checkpoint_every
+        self.count = 0
+        ensure_dir(manifest.parent)
+        if self.stream_path.exists():
+            self._move_aside()
+        self._fh = self.stream_path.open("w", encoding="utf-8")
+
+    def _move_aside(self) -> None:
+        aside = self.manifest.with_suffix(".crashed.ndjson")
+        os.replace(self.stream_path, aside)
+        note = f"{self.stream_path} left by an interrupted run; moved to {aside}"
+        if self.checkpoint_path.exists():
+            checkpoint = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+            os.replace(
+                self.checkpoint_path,
+                self.manifest.with_suffix(".crashed.checkpoint.json"),
+            )
+            note += f" ({checkpoint['records']} records durable)"
+        print(note, file=sys.stderr)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, record: dict) -> None:
+        self._fh.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.count += 1
+        if self.count % self.checkpoint_every == 0:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self.checkpoint_path.write_text(
+            json.dumps(
+                {
+                    "records": self.count,
+                    "bytes": self._fh.tell(),
+                    "updated_at_utc": datetime.now(timezone.utc).isoformat(),
+                }
+            ),
+            encoding="utf-8",
+        )
+
+    def records(self) -> Iterable[dict]:
+        self._fh.flush()
+        with self.stream_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def finalize(self) -> None:
+        # Same bytes as json.dumps(list_of_records, indent=2), one record at a time.
+        tmp = self.manifest.with_name(f".{self.manifest.name}.tmp")
+        with tmp.open("w", encoding="utf-8") as out:
+            first = True
+            for record in self.records():
+                body = json.dumps(record, indent=2).replace("\n", "\n  ")
+                out.write(("[\n  " if first else ",\n  ") + body)
+                first = False
+            out.write("[]" if first else "\n]")
+        self._fh.close()
+        os.replace(tmp, self.manifest)
+        self.stream_path.unlink()
+        self.checkpoint_path.unlink(missing_ok=True)
+
+
+# Page text sections for all_live_page_text.md go to a spool file as pages are
+# crawled; only (url, offset, length) stays in memory, so the URL-sorted
+# document is assembled without re-reading the per-page .txt files.
+class TextSpool:
+    def __init__(self, out_path: Path):
+        self.out_path = out_path
+        self.spool_path = out_path.with_suffix(".spool")
+        self._index: list[tuple[str, int, int]] = []
+        ensure_dir(out_path.parent)
+        self._fh = self.spool_path.open("w+b")
+
+    def add(self, url: str, text: str) -> None:
+        data = f"# {url}\n\n{text}\n".encode("utf-8")
+        self._index.append((url, self._fh.tell(), len(data)))
+        self._fh.write(data)
+
+    def finalize(self) -> None:
+        self._fh.flush()
+        with self.out_path.open("wb") as out:
+            for i, (_, offset, length) in enumerate(sorted(self._index)):
+                if i:
+                    out.write(b"\n")
+                self._fh.seek(offset)
+                out.write(self._fh.read(length))
+        self._fh.close()
+        self.spool_path.unlink()
+
+
 def route_tree(urls: Iterable[str]) -> dict:
     tree: dict = {}
     for url in sorted(set(urls)):
@@ -231,30 +319,165 @@ def fetch_url(url: str) -> tuple[bytes | None, str, str | None]:
         return None, "", None
 
 
+def crawl_live_pages(
+    seed_routes: list[str],
+    primary_hosts: set[str],
+    raw_dir: Path,
+    max_pages: int = MAX_CRAWL_PAGES,
+    fetch=fetch_url,
+    crawled_pages: list[dict] | RecordSink | None = None,
+    crawl_failures: list[dict] | RecordSink | None = None,
+    text_spool: TextSpool | None = None,
+    warc: WarcWriter | None = None,
+    cache: ExtractCache | None = None,
+):
+    # Frontier and seen-sets hold interned IDs; queued stops the same menu
+    # link from being enqueued once per page that carries it.
+    table = UrlTable()
+    crawl_queue = deque(table.intern(u) for u in seed_routes[:max_pages])
+    queued: set[int] = set(crawl_queue)
+    visited_routes: set[int] = set()
+    if crawled_pages is None:
+        crawled_pages = []
+    if crawl_failures is None:
+        crawl_failures = []
+    discovered_asset_urls: set[str] = set()
+    discovered_route_urls: set[str] = set(seed_routes)
+
+    while crawl_queue and len(visited_routes) < max_pages:
+        current_id = crawl_queue.popleft()
+        queued.discard(current_id)
+        if current_id in visited_routes:
+            continue
+        visited_routes.add(current_id)
+        current = table.url(current_id)
+
+        data, content_type, final_url = fetch(current)
+        if data is None:
+            crawl_failures.append({"url": current, "reason": "fetch_failed"})
+            continue
+        final = normalize_base_url(final_url or current)
+        if warc is not None:
+            warc.write_response(
+                final_url or current,
+                200,
+                [("Content-Type", content_type)],
+                data,
+                mime=content_type,
+            )
+
+        mime = content_type.split(";")[0].strip().lower()
+        if mime != "text/html":
+            continue
+
+        html = data.decode("utf-8", errors="replace")
+        page = collect_html(html, final, cache)
+
+        rel_html = url_to_rel_path(final, default_ext=".html")
+        html_out = raw_dir / "content" / "live_pages" / rel_html
+        txt_out = raw_dir / "content" / "live_pages" / rel_html.with_suffix(".txt")
+        ensure_dir(html_out.parent)
+        html_out.write_text(html, encoding="utf-8")
+        txt_out.write_text(page["text"], encoding="utf-8")
+
+        crawled_pages.append(
+            {
+                "url": final,
+                "html_file": str(html_out.as_posix()),
+                "text_file": str(txt_out.as_posix()),
+                "text_chars": len(page["text"]),
+            }
+        )
+        if text_spool is not None:
+            text_spool.add(final, page["text"])
+
+        for link in page["links"]:
+            parsed = split_url(link)
+            host = parsed.netloc.lower()
+            if host not in primary_hosts:
+                continue
+            if path_suffix(parsed.path or "/") in SKIP_ROUTE_EXTENSIONS:
+                continue
+            normalized = normalize_base_url(link)
+            link_id = table.intern(normalized)
+            discovered_route_urls.add(table.url(link_id))
+            if (
+                link_id not in visited_routes
+                and link_id not in queued
+                and len(visited_routes) + len(crawl_queue) < max_pages
+            ):
+                crawl_queue.append(link_id)
+                queued.add(link_id)
+
+        # HTMLCollector already resolved these to fragment-free http(s) URLs.
+        discovered_asset_urls.update(page["assets"])
+
+    return crawled_pages, crawl_failures, discovered_asset_urls, discovered_route_urls
+
+
+def har_started_at(entry: dict) -> datetime | None:
+    try:
+        return datetime.fromisoformat(entry.get("startedDateTime", ""))
+    except ValueError:
+        return None
+
+
 def main() -> int:
-    cwd = Path(".")
-    har_files = sorted(cwd.glob(HAR_GLOB))
+    ap = argparse.ArgumentParser(
+        description="Extract HAR bodies, routes and live page text into raw/."
+    )
+    ap.add_argument(
+        "--warc",
+        action="store_true",
+        help="also write raw/warc/extract.warc.gz (one gzip member per record) "
+        "and its sorted CDX index",
+    )
+    ap.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="reparse every page instead of reusing raw/cache/extract.sqlite",
+    )
+    ap.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    ap.add_argument(
+        "--har", type=Path, nargs="*", help="HAR files (default: *.har in cwd)"
+    )
+    ap.add_argument(
+        "--host",
+        action="append",
+        default=[],
+        help="primary host; repeatable (default: hosts of the HAR page titles)",
+    )
+    args = ap.parse_args()
+
+    raw_dir: Path = args.raw_dir
+    har_files = sorted(args.har) if args.har else sorted(Path(".").glob(HAR_GLOB))
     if not har_files:
         print("No .har files found in current directory.", file=sys.stderr)
         return 1
 
-    ensure_dir(RAW_DIR)
-    ensure_dir(RAW_DIR / "har_bodies")
-    ensure_dir(RAW_DIR / "manifests")
-    ensure_dir(RAW_DIR / "routes")
-    ensure_dir(RAW_DIR / "content")
-    ensure_dir(RAW_DIR / "content" / "live_pages")
-    ensure_dir(RAW_DIR / "content" / "har_pages")
-    ensure_dir(RAW_DIR / "assets" / "live")
-
+    ensure_dir(raw_dir)
+    ensure_dir(raw_dir / "har_bodies")
+    ensure_dir(raw_dir / "manifests")
+    ensure_dir(raw_dir / "routes")
+    ensure_dir(raw_dir / "content")
+    ensure_dir(raw_dir / "content" / "live_pages")
+    ensure_dir(raw_dir / "content" / "har_pages")
+    ensure_dir(raw_dir / "assets" / "live")
+
+    manifests_dir = raw_dir / "manifests"
+    warc = WarcWriter(raw_dir / "warc" / "extract.warc.gz") if args.warc else None
+    cache = None
+    if not args.no_cache:
+        cache = ExtractCache(raw_dir / "cache" / "extract.sqlite")
     har_manifest = []
-    har_body_records = []
+    har_body_records = RecordSink(manifests_dir / "har_bodies.json")
     har_body_files: set[str] = set()
-    missing_body_records = []
-    har_page_text_records = []
+    missing_body_records = RecordSink(manifests_dir / "missing_har_bodies.json")
+    har_page_text_records = RecordSink(manifests_dir / "har_page_text.json")
     page_seed_urls: set[str] = set()
     html_seed_urls: set[str] = set()
-    primary_hosts: set[str] = set()
+    fixed_hosts = {h.lower() for h in args.host}
+    primary_hosts: set[str] = set(fixed_hosts)
     all_har_urls: set[str] = set()
     mime_counter: Counter[str] = Counter()
     status_counter: Counter[int] = Counter()
@@ -270,9 +493,12 @@ def main() -> int:
         for p in pages:
             title = p.get("title", "")
             if isinstance(title, str) and title.startswith(("http://", "https://")):
+                host = split_url(title).netloc.lower()
                 page_urls.append(title)
+                if fixed_hosts and host not in fixed_hosts:
+                    continue
                 page_seed_urls.add(normalize_base_url(title))
-                primary_hosts.add(split_url(title).netloc.lower())
+                primary_hosts.add(host)
 
         for entry in entries:
             request = entry.get("request", {})
@@ -304,9 +530,23 @@ def main() -> int:
                 )
                 continue
 
+            if warc is not None:
+                warc.write_response(
+                    url,
+                    status,
+                    [
+                        (h.get("name", ""), h.get("value", ""))
+                        for h in response.get("headers", [])
+                        if h.get("name")
+                    ],
+                    payload,
+                    mime=mime,
+                    fetched_at=har_started_at(entry),
+                )
+
             ext = guess_ext_from_mime(mime)
             rel_path = url_to_rel_path(url, default_ext=ext)
-            out_file = RAW_DIR / "har_bodies" / rel_path
+            out_file = raw_dir / "har_bodies" / rel_path
             ensure_dir(out_file.parent)
             out_file.write_bytes(payload)
             har_body_files.add(str(out_file.as_posix()))
@@ -324,21 +564,20 @@ def main() -> int:
 
             if host in primary_hosts and is_html_mime(mime):
                 html = payload.decode("utf-8", errors="replace")
-                collector = HTMLCollector(url)
-                collector.feed(html)
+                page = collect_html(html, url, cache)
                 txt_path = (
-                    RAW_DIR
+                    raw_dir
                     / "content"
                     / "har_pages"
                     / url_to_rel_path(url, default_ext=".txt")
                 )
                 ensure_dir(txt_path.parent)
-                txt_path.write_text(collector.text, encoding="utf-8")
+                txt_path.write_text(page["text"], encoding="utf-8")
                 har_page_text_records.append(
                     {
                         "url": url,
                         "text_file": str(txt_path.as_posix()),
-                        "text_chars": len(collector.text),
+                        "text_chars": len(page["text"]),
                     }
                 )
 
@@ -355,83 +594,24 @@ def main() -> int:
     if not primary_hosts and seed_routes:
         primary_hosts = {split_url(seed_routes[0]).netloc.lower()}
 
-    crawl_queue = deque(seed_routes[:MAX_CRAWL_PAGES])
-    visited_routes: set[str] = set()
-    crawled_pages = []
-    crawl_failures = []
-    discovered_asset_urls: set[str] = set()
-    discovered_route_urls: set[str] = set(seed_routes)
-
-    while crawl_queue and len(visited_routes) < MAX_CRAWL_PAGES:
-        current = crawl_queue.popleft()
-        if current in visited_routes:
-            continue
-        visited_routes.add(current)
-
-        data, content_type, final_url = fetch_url(current)
-        if data is None:
-            crawl_failures.append({"url": current, "reason": "fetch_failed"})
-            continue
-        final = normalize_base_url(final_url or current)
-
-        mime = content_type.split(";")[0].strip().lower()
-        if mime != "text/html":
-            continue
-
-        html = data.decode("utf-8", errors="replace")
-        collector = HTMLCollector(final)
-        collector.feed(html)
-
-        rel_html = url_to_rel_path(final, default_ext=".html")
-        html_out = RAW_DIR / "content" / "live_pages" / rel_html
-        txt_out = RAW_DIR / "content" / "live_pages" / rel_html.with_suffix(".txt")
-        ensure_dir(html_out.parent)
-        html_out.write_text(html, encoding="utf-8")
-        txt_out.write_text(collector.text, encoding="utf-8")
-
-        crawled_pages.append(
-            {
-                "url": final,
-                "html_file": str(html_out.as_posix()),
-                "text_file": str(txt_out.as_posix()),
-                "text_chars": len(collector.text),
-            }
-        )
-
-        for link in collector.links:
-            parsed = split_url(link)
-            host = parsed.netloc.lower()
-            if host not in primary_hosts:
-                continue
-            path = parsed.path or "/"
-            ext = Path(path).suffix.lower()
-            if ext in SKIP_ROUTE_EXTENSIONS:
-                continue
-            normalized = normalize_base_url(link)
-            discovered_route_urls.add(normalized)
-            if (
-                normalized not in visited_routes
-                and len(visited_routes) + len(crawl_queue) < MAX_CRAWL_PAGES
-            ):
-                crawl_queue.append(normalized)
-
-        for asset in collector.assets:
-            parsed = split_url(asset)
-            if parsed.scheme in {"http", "https"}:
-                discovered_asset_urls.add(
-                    urlunsplit(
-                        (
-                            parsed.scheme,
-                            parsed.netloc,
-                            parsed.path or "/",
-                            parsed.query,
-                            "",
-                        )
-                    )
-                )
+    crawled_pages = RecordSink(manifests_dir / "live_pages.json")
+    crawl_failures = RecordSink(manifests_dir / "crawl_failures.json")
+    text_spool = TextSpool(raw_dir / "content" / "all_live_page_text.md")
+    _, _, discovered_asset_urls, discovered_route_urls = crawl_live_pages(
+        seed_routes,
+        primary_hosts,
+        raw_dir,
+        crawled_pages=crawled_pages,
+        crawl_failures=crawl_failures,
+        text_spool=text_spool,
+        warc=warc,
+        cache=cache,
+    )
+    if warc is not None:
+        warc.close()
 
-    same_host_assets = []
-    skipped_assets = []
+    same_host_assets = RecordSink(manifests_dir / "live_assets.json")
+    skipped_assets = RecordSink(manifests_dir / "live_asset_skips.json")
     for asset_url in sorted(discovered_asset_urls):
         parsed = split_url(asset_url)
         host = parsed.netloc.lower()
@@ -449,46 +629,28 @@ def main() -> int:
         "all_route_paths": all_route_paths,
         "route_tree": route_tree(all_route_paths),
     }
-    (RAW_DIR / "routes" / "routes.json").write_text(
+    (raw_dir / "routes" / "routes.json").write_text(
         json.dumps(routes_json, indent=2), encoding="utf-8"
     )
-    (RAW_DIR / "routes" / "routes.txt").write_text(
+    (raw_dir / "routes" / "routes.txt").write_text(
         "\n".join(all_route_paths) + "\n", encoding="utf-8"
     )
 
-    combined_text_parts = []
-    for item in sorted(crawled_pages, key=lambda x: x["url"]):
-        text_file = Path(item["text_file"])
-        text = text_file.read_text(encoding="utf-8", errors="replace")
-        combined_text_parts.append(f"# {item['url']}\n\n{text}\n")
-    (RAW_DIR / "content" / "all_live_page_text.md").write_text(
-        "\n".join(combined_text_parts), encoding="utf-8"
-    )
+    text_spool.finalize()
 
-    (RAW_DIR / "manifests" / "har_summary.json").write_text(
+    (raw_dir / "manifests" / "har_summary.json").write_text(
         json.dumps(har_manifest, indent=2), encoding="utf-8"
     )
-    (RAW_DIR / "manifests" / "har_bodies.json").write_text(
-        json.dumps(har_body_records, indent=2), encoding="utf-8"
-    )
-    (RAW_DIR / "manifests" / "missing_har_bodies.json").write_text(
-        json.dumps(missing_body_records, indent=2), encoding="utf-8"
-    )
-    (RAW_DIR / "manifests" / "har_page_text.json").write_text(
-        json.dumps(har_page_text_records, indent=2), encoding="utf-8"
-    )
-    (RAW_DIR / "manifests" / "live_pages.json").write_text(
-        json.dumps(crawled_pages, indent=2), encoding="utf-8"
-    )
-    (RAW_DIR / "manifests" / "live_assets.json").write_text(
-        json.dumps(same_host_assets, indent=2), encoding="utf-8"
-    )
-    (RAW_DIR / "manifests" / "live_asset_skips.json").write_text(
-        json.dumps(skipped_assets, indent=2), encoding="utf-8"
-    )
-    (RAW_DIR / "manifests" / "crawl_failures.json").write_text(
-        json.dumps(crawl_failures, indent=2), encoding="utf-8"
-    )
+    for sink in (
+        har_body_records,
+        missing_body_records,
+        har_page_text_records,
+        crawled_pages,
+        same_host_assets,
+        skipped_assets,
+        crawl_failures,
+    ):
+        sink.finalize()
 
     report = {
         "generated_at_utc": datetime.now(timezone.utc).isoformat(),
@@ -509,7 +671,12 @@ def main() -> int:
         "mime_counts": dict(mime_counter),
         "status_counts": {str(k): v for k, v in status_counter.items()},
     }
-    (RAW_DIR / "manifests" / "report.json").write_text(
+    if warc is not None:
+        report["warc_records"] = len(warc)
+    if cache is not None:
+        report["extract_cache"] = cache.stats()
+        cache.close()
+    (raw_dir / "manifests" / "report.json").write_text(
         json.dumps(report, indent=2), encoding="utf-8"
     )
 
@@ -550,7 +717,7 @@ This folder contains a structured extraction of site routes, content, and assets
 - Use `manifests/live_assets.json` as the candidate list if you want to fetch additional live assets.
 - Review `manifests/missing_har_bodies.json` to see which HAR requests lacked embedded response bodies.
 """
-    (RAW_DIR / "README.md").write_text(readme, encoding="utf-8")
+    (raw_dir / "README.md").write_text(readme, encoding="utf-8")
 
     print(json.dumps(report, indent=2))
     return 0
@@ -3,19 +3,14 @@ from __future__ import annotations
 import json
 import sys
 from collections import Counter, defaultdict
-from dataclasses import dataclass
 from pathlib import Path
-from urllib.parse import urlsplit
 
+import schema
+from schema import PageRecord
 
-def load_jsonl(path: Path):
-    out = []
-    for line in path.read_text(encoding="utf-8", errors="replace").splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        out.append(json.loads(line))
-    return out
+
+def load_jsonl(path: Path) -> list[PageRecord]:
+    return list(schema.iter_jsonl(path, PageRecord))
 
 
 def main() -> int:
@@ -27,21 +22,21 @@ def main() -> int:
     out_path = Path(sys.argv[2])
     rows = load_jsonl(in_path)
 
-    kind_counts = Counter(r.get("kind") for r in rows)
+    kind_counts = Counter(r.kind for r in rows)
     path_prefix = Counter()
     by_kind_examples: dict[str, list[str]] = defaultdict(list)
 
     for r in rows:
-        path = (r.get("path") or "/").strip("/")
+        path = (r.path or "/").strip("/")
         prefix = path.split("/", 1)[0] if path else "/"
         path_prefix[prefix] += 1
-        k = r.get("kind") or "unknown"
+        k = r.kind or "unknown"
         if len(by_kind_examples[k]) < 5:
-            by_kind_examples[k].append(r.get("url"))
+            by_kind_examples[k].append(r.url)
 
     # crude blog detection
-    posts = [r for r in rows if r.get("kind") == "post"]
-    pages = [r for r in rows if r.get("kind") in {"page", "home"}]
+    posts = [r for r in rows if r.kind == "post"]
+    pages = [r for r in rows if r.kind in {"page", "home"}]
 
     report = {
         "pages_total": len(rows),
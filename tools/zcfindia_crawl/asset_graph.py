@@ -0,0 +1,436 @@
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from html.parser import HTMLParser
+from pathlib import Path
+
+import download_assets
+import page_store
+import schema
+from schema import AssetGraph, HarBodyRecord, LivePageRecord, PageAssets, PageRecord
+from urls import (
+    canonical_route_path,
+    join_url,
+    normalize_asset_url,
+    normalize_url,
+    split_url,
+    strip_fragment,
+    url_to_rel_path,
+)
+
+
+TIERS = ("hero", "inline", "other")
+IMG_SRC_ATTRS = ("data-src", "data-lazy-src", "data-original", "src")
+IMG_SRCSET_ATTRS = ("srcset", "data-srcset", "data-lazy-srcset")
+ICON_RELS = {"icon", "shortcut", "apple-touch-icon", "apple-touch-icon-precomposed"}
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""", re.I)
+CSS_IMPORT = re.compile(r"""@import\s+(?:url\(\s*)?(['"]?)([^'")\s;]+)\1""", re.I)
+
+
+def resolve(base: str, raw: str | None) -> str | None:
+    if not raw or raw.strip().startswith("data:"):
+        return None
+    url = strip_fragment(join_url(base, raw.strip()))
+    return normalize_asset_url(url) if url else None
+
+
+def largest_candidate(srcset: str) -> str | None:
+    # Only the widest srcset entry is kept: the smaller ones are thumbnail
+    # variants of the same image.
+    best, best_size = None, -1.0
+    for part in srcset.split(","):
+        bits = part.split()
+        if not bits:
+            continue
+        size = 1.0
+        if len(bits) > 1 and bits[1][-1:] in ("w", "x"):
+            try:
+                size = float(bits[1][:-1])
+            except ValueError:
+                pass
+        if size >= best_size:
+            best, best_size = bits[0], size
+    return best
+
+
+def css_refs(css: str, base: str) -> tuple[list[str], list[str]]:
+    # (url() targets, @import targets), resolved against the sheet's URL.
+    imports = [resolve(base, m.group(2)) for m in CSS_IMPORT.finditer(css)]
+    urls = [resolve(base, m.group(2)) for m in CSS_URL.finditer(css)]
+    imports = [u for u in imports if u]
+    return [u for u in urls if u and u not in imports], imports
+
+
+def json_ld_images(node: object):
+    if isinstance(node, list):
+        for item in node:
+            yield from json_ld_images(item)
+        return
+    if not isinstance(node, dict):
+        return
+    if node.get("@type") in {"ImageObject", "imageObject"}:
+        for key in ("url", "contentUrl"):
+            if isinstance(node.get(key), str):
+                yield node[key]
+    image = node.get("image")
+    if isinstance(image, str):
+        yield image
+    for value in node.values():
+        if isinstance(value, (dict, list)):
+            yield from json_ld_images(value)
+
+
+class AssetCollector(HTMLParser):
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.json_ld: list[str] = []
+        self.og_image: list[str] = []
+        self.inline: list[str] = []
+        self.other: list[str] = []
+        self.stylesheets: list[str] = []
+        self._capture: str | None = None
+        self._buf: list[str] = []
+        # None outside <picture>, else whether a <source> was already taken.
+        self._picture: bool | None = None
+
+    def _add(self, raw: str | None, out: list[str]) -> None:
+        url = resolve(self.base_url, raw)
+        if url:
+            out.append(url)
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        attr = {k: v for k, v in attrs if v}
+        if tag == "base" and attr.get("href"):
+            self.base_url = join_url(self.base_url, attr["href"])
+        elif tag == "picture":
+            self._picture = False
+        elif tag in ("img", "source"):
+            if self._picture:
+                # The <img> in a <picture> is the fallback for the source
+                # already taken.
+                return
+            srcset = next((attr[a] for a in IMG_SRCSET_ATTRS if a in attr), None)
+            src = next((attr[a] for a in IMG_SRC_ATTRS if a in attr), None)
+            count = len(self.inline)
+            if srcset:
+                self._add(largest_candidate(srcset), self.inline)
+            elif tag == "img" or attr.get("type", "").startswith("image/"):
+                self._add(src, self.inline)
+            if self._picture is not None and len(self.inline) > count:
+                self._picture = True
+        elif tag == "meta":
+            prop = (attr.get("property") or attr.get("name") or "").lower()
+            if prop in ("og:image", "og:image:secure_url", "twitter:image"):
+                self._add(attr.get("content"), self.og_image)
+        elif tag == "link":
+            rels = set((attr.get("rel") or "").lower().split())
+            if "stylesheet" in rels:
+                self._add(attr.get("href"), self.stylesheets)
+            elif rels & ICON_RELS or (
+                "preload" in rels and attr.get("as") in ("image", "font", "style")
+            ):
+                self._add(attr.get("href"), self.other)
+        elif tag == "script" and attr.get("type") == "application/ld+json":
+            self._capture = "ld"
+        elif tag == "style":
+            self._capture = "style"
+        if attr.get("style"):
+            self.other.extend(css_refs(attr["style"], self.base_url)[0])
+
+    def handle_data(self, data: str) -> None:
+        if self._capture:
+            self._buf.append(data)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "picture":
+            self._picture = None
+        if tag not in ("script", "style") or not self._capture:
+            return
+        text = "".join(self._buf)
+        if self._capture == "ld":
+            try:
+                for raw in json_ld_images(json.loads(text.strip().lstrip("\ufeff"))):
+                    self._add(raw, self.json_ld)
+            except ValueError:
+                pass
+        else:
+            urls, imports = css_refs(text, self.base_url)
+            self.other.extend(urls)
+            self.stylesheets.extend(imports)
+        self._capture = None
+        self._buf = []
+
+    def page_assets(self, hero: str | None = None) -> PageAssets:
+        # The first JSON-LD image (what the spider calls primary_image), else
+        # og:image, is the hero; remaining JSON-LD images rank as inline.
+        candidates = [hero] if hero else []
+        candidates += self.json_ld[:1] + self.og_image[:1]
+        hero_urls = [normalize_asset_url(candidates[0])] if candidates else []
+        return PageAssets(
+            hero=hero_urls,
+            inline=self.inline + self.json_ld[1:],
+            other=self.other,
+            stylesheets=self.stylesheets,
+        )
+
+
+def page_assets(html: str, url: str, hero: str | None = None) -> PageAssets:
+    collector = AssetCollector(url)
+    collector.feed(html)
+    collector.close()
+    return collector.page_assets(hero)
+
+
+def merge(into: PageAssets, new: PageAssets) -> None:
+    # Each URL appears once per route, under its highest-priority tier.
+    seen: set[str] = set()
+    for name in (*TIERS, "stylesheets"):
+        urls = []
+        for url in getattr(into, name) + getattr(new, name):
+            if url not in seen:
+                seen.add(url)
+                urls.append(url)
+        setattr(into, name, urls)
+
+
+def page_sources(raw_dir: Path, pages_jsonl: Path):
+    # (route URL, HTML, hero) from every place a page's HTML is kept.
+    for rec in schema.read_manifest(
+        raw_dir / "manifests" / "live_pages.json", LivePageRecord
+    ):
+        # Where extract_har_to_raw.py saved it, under this raw_dir.
+        rel = url_to_rel_path(rec.url, default_ext=".html")
+        path = raw_dir / "content" / "live_pages" / rel
+        if page_store.exists(path):
+            yield rec.url, page_store.read_text(path), None
+    for rec in schema.read_manifest(
+        raw_dir / "manifests" / "har_bodies.json", HarBodyRecord
+    ):
+        if rec.mime.split(";")[0].strip().lower() == "text/html":
+            path = schema.har_body_path(raw_dir, rec)
+            if path.exists():
+                yield rec.url, path.read_text(encoding="utf-8", errors="replace"), None
+    if pages_jsonl.exists():
+        for rec in schema.iter_jsonl(pages_jsonl, PageRecord):
+            yield rec.url, rec.content_html or "", rec.primary_image
+
+
+def stylesheet_bodies(raw_dir: Path) -> dict[str, Path]:
+    bodies = {}
+    for rec in schema.read_manifest(
+        raw_dir / "manifests" / "har_bodies.json", HarBodyRecord
+    ):
+        if rec.mime.split(";")[0].strip().lower() == "text/css":
+            bodies[normalize_asset_url(rec.url)] = schema.har_body_path(raw_dir, rec)
+    return bodies
+
+
+def build(raw_dir: Path, pages_jsonl: Path, live_root: Path) -> tuple[AssetGraph, dict]:
+    graph = AssetGraph()
+    documents = 0
+    for url, html, hero in page_sources(raw_dir, pages_jsonl):
+        route = normalize_url(url)
+        assets = graph.routes.setdefault(route, PageAssets())
+        merge(assets, page_assets(html, url, hero))
+        documents += 1
+
+    # Follow stylesheets (and their @imports) to the fonts and background
+    # images they pull in.
+    bodies = stylesheet_bodies(raw_dir)
+    queue = sorted({u for a in graph.routes.values() for u in a.stylesheets})
+    missing = 0
+    while queue:
+        sheet = queue.pop()
+        if sheet in graph.stylesheets:
+            continue
+        path = bodies.get(sheet) or live_root / url_to_rel_path(sheet)
+        if not path.is_file():
+            graph.stylesheets[sheet] = []
+            missing += 1
+            continue
+        urls, imports = css_refs(
+            path.read_text(encoding="utf-8", errors="replace"), sheet
+        )
+        graph.stylesheets[sheet] = list(dict.fromkeys(imports + urls))
+        queue.extend(u for u in imports if u not in graph.stylesheets)
+
+    graph.routes = dict(sorted(graph.routes.items()))
+    graph.stylesheets = dict(sorted(graph.stylesheets.items()))
+    stats = {
+        "documents": documents,
+        "routes": len(graph.routes),
+        "stylesheets": len(graph.stylesheets),
+        "stylesheets_without_body": missing,
+        "edges": sum(
+            len(getattr(a, name))
+            for a in graph.routes.values()
+            for name in (*TIERS, "stylesheets")
+        )
+        + sum(len(v) for v in graph.stylesheets.values()),
+    }
+    return graph, stats
+
+
+def resolve_routes(graph: AssetGraph, keep: list[str]) -> tuple[list[str], list[str]]:
+    # Kept routes may be given as URLs or as paths (routes.txt style).
+    by_path: dict[str, list[str]] = {}
+    for route in graph.routes:
+        by_path.setdefault(canonical_route_path(route), []).append(route)
+    routes, unknown = [], []
+    for item in keep:
+        if item.startswith("http"):
+            found = [normalize_url(item)] if normalize_url(item) in graph.routes else []
+        else:
+            found = by_path.get(
+                canonical_route_path("https://x/" + item.lstrip("/")), []
+            )
+        if found:
+            routes.extend(found)
+        else:
+            unknown.append(item)
+    return list(dict.fromkeys(routes)), unknown
+
+
+def plan(graph: AssetGraph, routes: list[str], hosts: set[str]) -> list[dict]:
+    # url -> [tier, referencing routes, first seen]; a URL takes the best
+    # tier any kept route gives it.
+    found: dict[str, list[int]] = {}
+
+    def add(url: str, tier: int) -> None:
+        entry = found.get(url)
+        if entry is None:
+            found[url] = [tier, 1, len(found)]
+        else:
+            entry[0] = min(entry[0], tier)
+            entry[1] += 1
+
+    for route in routes:
+        assets = graph.routes[route]
+        reached: set[str] = set()
+        for tier, name in enumerate(TIERS):
+            for url in getattr(assets, name):
+                if url not in reached:
+                    reached.add(url)
+                    add(url, tier)
+        stack = list(assets.stylesheets)
+        while stack:
+            url = stack.pop()
+            if url in reached:
+                continue
+            reached.add(url)
+            add(url, len(TIERS) - 1)
+            stack.extend(graph.stylesheets.get(url, []))
+
+    ordered = sorted(found.items(), key=lambda kv: (kv[1][0], -kv[1][1], kv[1][2]))
+    return [
+        {"url": url, "tier": TIERS[tier], "routes": refs}
+        for url, (tier, refs, _) in ordered
+        if split_url(url).netloc.lower() in hosts
+    ]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Page -> asset reference graph and a download planner for kept routes."
+    )
+    ap.add_argument("--raw-dir", type=Path, default=Path("raw"))
+    ap.add_argument(
+        "--graph", type=Path, help="default: <raw-dir>/manifests/asset_graph.json"
+    )
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_build = sub.add_parser("build")
+    p_build.add_argument(
+        "--pages-jsonl", type=Path, help="default: <raw-dir>/scrapy/pages.jsonl"
+    )
+
+    p_plan = sub.add_parser("plan")
+    p_plan.add_argument(
+        "--keep",
+        type=Path,
+        help="kept routes, one URL or path per line (default: every route)",
+    )
+    p_plan.add_argument(
+        "--host", action="append", default=[], help="default: the routes' hosts"
+    )
+    p_plan.add_argument("--limit", type=int, default=0, help="0 = no limit")
+    p_plan.add_argument("--dry-run", action="store_true", help="write the plan only")
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    raw_dir = args.raw_dir
+    graph_path = args.graph or raw_dir / "manifests" / "asset_graph.json"
+    live_root = raw_dir / "assets" / "live"
+
+    if args.cmd == "build":
+        pages_jsonl = args.pages_jsonl or raw_dir / "scrapy" / "pages.jsonl"
+        graph, stats = build(raw_dir, pages_jsonl, live_root)
+        graph_path.parent.mkdir(parents=True, exist_ok=True)
+        schema.write_manifest(graph_path, graph)
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        stats["out"] = str(graph_path)
+        print(json.dumps(stats, indent=2))
+        return 0
+
+    graph = schema.read_document(graph_path, AssetGraph)
+    if graph is None:
+        print(f"{graph_path} not found; run `build` first", file=sys.stderr)
+        return 2
+    if args.keep:
+        lines = args.keep.read_text(encoding="utf-8").splitlines()
+        keep = [ln.strip() for ln in lines if ln.strip() and not ln.startswith("#")]
+    else:
+        keep = list(graph.routes)
+    routes, unknown = resolve_routes(graph, keep)
+    hosts = {h.lower() for h in args.host} or {
+        split_url(r).netloc.lower() for r in routes
+    }
+    planned = plan(graph, routes, hosts)
+    if args.limit:
+        planned = planned[: args.limit]
+
+    har_root = raw_dir / "har_bodies"
+    flagged = download_assets.flagged_files(
+        raw_dir / "manifests" / "integrity.json", raw_dir
+    )
+    sess = None if args.dry_run else download_assets.make_session()
+    counts = {"skipped_exists": 0, "downloaded": 0, "failed": 0, "bytes": 0}
+    for item in planned:
+        if download_assets.is_present(item["url"], live_root, har_root, flagged):
+            item["status"] = "present"
+            counts["skipped_exists"] += 1
+        elif sess is None:
+            item["status"] = "planned"
+        elif download_assets.download_one(sess, item["url"], live_root):
+            item["status"] = "downloaded"
+            counts["downloaded"] += 1
+            counts["bytes"] += (live_root / url_to_rel_path(item["url"])).stat().st_size
+        else:
+            item["status"] = "failed"
+            counts["failed"] += 1
+
+    plan_path = raw_dir / "manifests" / "asset_plan.json"
+    plan_path.parent.mkdir(parents=True, exist_ok=True)
+    schema.write_manifest(plan_path, planned)
+    summary = {
+        "routes_kept": len(routes),
+        "routes_unknown": len(unknown),
+        "unknown_sample": unknown[:10],
+        "assets_reachable": len(planned),
+        "by_tier": {t: sum(1 for p in planned if p["tier"] == t) for t in TIERS},
+        **counts,
+        "dry_run": args.dry_run,
+        "seconds": round(time.perf_counter() - started, 3),
+        "plan": str(plan_path),
+    }
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import schema
+from schema import HarBodyRecord, MissingBodyRecord
+from urls import normalize_asset_url, url_to_rel_path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from extract_har_to_raw import guess_ext_from_mime  # noqa: E402
+
+
+CACHEABLE_MIME_PREFIXES = ("image/", "font/", "audio/", "video/")
+CACHEABLE_MIMES = {
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "application/x-javascript",
+    "application/font-woff",
+    "application/font-woff2",
+    "application/x-font-ttf",
+    "application/x-font-woff",
+    "application/vnd.ms-fontobject",
+}
+
+
+def is_cacheable(status: int, mime: str) -> bool:
+    if status != 200:
+        return False
+    mime = (mime or "").split(";")[0].strip().lower()
+    return mime in CACHEABLE_MIMES or mime.startswith(CACHEABLE_MIME_PREFIXES)
+
+
+def read_json(path: Path, default):
+    if not path.exists():
+        return default
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def plan_backfill(
+    missing: list[MissingBodyRecord],
+) -> tuple[dict[str, list[MissingBodyRecord]], Counter]:
+    # One fetch per normalized URL; the HAR often repeats the same asset per page.
+    targets: dict[str, list[MissingBodyRecord]] = {}
+    skipped: Counter[str] = Counter()
+    for rec in missing:
+        url = rec.url
+        if not url.startswith(("http://", "https://")):
+            skipped["invalid_url"] += 1
+            continue
+        status = rec.status
+        if status != 200:
+            skipped[f"status_{status}"] += 1
+            continue
+        if not is_cacheable(status, rec.mime):
+            skipped["not_cacheable"] += 1
+            continue
+        targets.setdefault(normalize_asset_url(url), []).append(rec)
+    return targets, skipped
+
+
+_local = threading.local()
+
+
+def thread_session(pool_size: int) -> requests.Session:
+    sess = getattr(_local, "session", None)
+    if sess is None:
+        sess = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        sess.mount("https://", adapter)
+        sess.mount("http://", adapter)
+        sess.headers.update(
+            {
+                "User-Agent": "Mozilla/5.0 (compatible; zcf-har-backfill/1.0)",
+                "Accept": "*/*",
+            }
+        )
+        _local.session = sess
+    return sess
+
+
+def fetch_one(
+    url: str, recs: list[MissingBodyRecord], har_root: Path, pool_size: int, timeout: float
+) -> dict:
+    first = recs[0]
+    out_file = har_root / url_to_rel_path(
+        first.url, default_ext=guess_ext_from_mime(first.mime)
+    )
+    result = {"url": url, "file": str(out_file.as_posix()), "entries": len(recs)}
+    if out_file.exists() and out_file.stat().st_size > 0:
+        result.update(outcome="already_present", size_bytes=out_file.stat().st_size)
+        return result
+
+    try:
+        r = thread_session(pool_size).get(url, timeout=timeout)
+    except Exception as exc:
+        result.update(outcome="failed", reason=type(exc).__name__)
+        return result
+    if r.status_code != 200 or not r.content:
+        result.update(outcome="failed", reason=f"http_{r.status_code}")
+        return result
+
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_file.with_name(f".{out_file.name}.part")
+    tmp.write_bytes(r.content)
+    os.replace(tmp, out_file)
+    result.update(outcome="fetched", size_bytes=len(r.content))
+    return result
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Fetch cacheable HAR entries that were captured without a body."
+    )
+    ap.add_argument("--raw", type=Path, default=Path("raw"))
+    ap.add_argument("--workers", type=int, default=16)
+    ap.add_argument("--timeout", type=float, default=25)
+    ap.add_argument("--limit", type=int, default=0, help="0 = no limit")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    manifests = args.raw / "manifests"
+    har_root = args.raw / "har_bodies"
+    missing_path = manifests / "missing_har_bodies.json"
+    bodies_path = manifests / "har_bodies.json"
+    report_path = manifests / "report.json"
+
+    missing = schema.read_manifest(missing_path, MissingBodyRecord)
+    targets, skipped = plan_backfill(missing)
+    urls = sorted(targets)
+    if args.limit > 0:
+        urls = urls[: args.limit]
+
+    if args.dry_run:
+        print(
+            json.dumps(
+                {
+                    "missing_entries": len(missing),
+                    "unique_urls_to_fetch": len(urls),
+                    "skipped_entries": dict(skipped),
+                },
+                indent=2,
+            )
+        )
+        return 0
+
+    results: list[dict] = []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(
+                fetch_one, url, targets[url], har_root, args.workers, args.timeout
+            )
+            for url in urls
+        ]
+        for fut in as_completed(futures):
+            results.append(fut.result())
+    results.sort(key=lambda r: r["url"])
+
+    filled: dict[str, dict] = {
+        r["url"]: r for r in results if r["outcome"] in {"fetched", "already_present"}
+    }
+    har_bodies = schema.read_manifest(bodies_path, HarBodyRecord)
+    still_missing = []
+    for rec in missing:
+        done = filled.get(normalize_asset_url(rec.url))
+        if done is None:
+            still_missing.append(rec)
+            continue
+        har_bodies.append(
+            HarBodyRecord(
+                har_file=rec.har_file,
+                url=rec.url,
+                status=rec.status,
+                mime=rec.mime,
+                size_bytes=done["size_bytes"],
+                file=done["file"],
+                source="backfill",
+            )
+        )
+
+    schema.write_manifest(bodies_path, har_bodies)
+    schema.write_manifest(missing_path, still_missing)
+    schema.write_manifest(manifests / "har_backfill.json", results)
+
+    report = read_json(report_path, None)
+    if isinstance(report, dict):
+        report["har_saved_body_records"] = len(har_bodies)
+        report["har_saved_body_files_unique"] = len({r.file for r in har_bodies})
+        report["har_missing_bodies"] = len(still_missing)
+        schema.write_manifest(report_path, report)
+
+    outcomes = Counter(r["outcome"] for r in results)
+    print(
+        json.dumps(
+            {
+                "missing_entries_before": len(missing),
+                "missing_entries_after": len(still_missing),
+                "unique_urls_attempted": len(urls),
+                "outcomes": dict(outcomes),
+                "bytes_fetched": sum(
+                    r.get("size_bytes", 0) for r in results if r["outcome"] == "fetched"
+                ),
+                "skipped_entries": dict(skipped),
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,497 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+import page_store
+
+
+TOOLS_DIR = Path(__file__).resolve().parent
+REPO_ROOT = TOOLS_DIR.parents[1]
+SITE_HOST = "zcfindia.org"
+ORIGIN_HOSTS = {SITE_HOST, f"www.{SITE_HOST}"}
+CLONE_PREFIX = "/bench-clone/"
+TOOLS = ("spider", "extract", "download")
+
+CONTENT_TYPES = {
+    ".html": "text/html; charset=UTF-8",
+    ".css": "text/css",
+    ".js": "application/javascript",
+    ".json": "application/json",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".svg": "image/svg+xml",
+    ".mp4": "video/mp4",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+    ".ttf": "font/ttf",
+}
+
+
+def load_site(raw_dir: Path) -> tuple[dict[str, bytes], dict[str, Path]]:
+    pages: dict[str, bytes] = {}
+    pages_root = raw_dir / "content" / "live_pages" / SITE_HOST
+    for rel_file in page_store.iter_files(pages_root):
+        if rel_file.rsplit("/", 1)[-1] != "index.html":
+            continue
+        rel = rel_file.removesuffix("index.html").rstrip("/")
+        path = f"/{rel}/" if rel else "/"
+        pages[path] = page_store.read_bytes(pages_root / rel_file)
+
+    # Later roots win, so live downloads shadow HAR bodies for the same path.
+    assets: dict[str, Path] = {}
+    for root in (
+        raw_dir / "har_bodies" / SITE_HOST,
+        raw_dir / "assets" / "live" / SITE_HOST,
+    ):
+        if not root.is_dir():
+            continue
+        for f in root.rglob("*"):
+            if f.is_file():
+                assets["/" + f.relative_to(root).as_posix()] = f
+    return pages, assets
+
+
+class SiteState:
+    def __init__(
+        self,
+        pages: dict[str, bytes],
+        assets: dict[str, Path],
+        scale: int,
+        latency_ms: float,
+        error_rate: float,
+        seed: int,
+    ):
+        self.pages = pages
+        self.assets = assets
+        self.templates = [pages[p] for p in sorted(pages)]
+        self.scale = scale
+        self.latency = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> dict:
+        with self._lock:
+            snapshot = dict(getattr(self, "counters", {}))
+            self.counters = {
+                "requests": 0,
+                "pages_served": 0,
+                "assets_served": 0,
+                "errors_injected": 0,
+                "not_found": 0,
+                "bytes_sent": 0,
+            }
+        return snapshot
+
+    def count(self, key: str, nbytes: int = 0) -> None:
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters[key] += 1
+            self.counters["bytes_sent"] += nbytes
+
+    def should_fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def clone_links(self, index: int | None) -> bytes:
+        # Clones form a binary tree under the home page so a BFS from "/"
+        # reaches every synthetic route.
+        if self.scale <= 0:
+            return b""
+        children = [0] if index is None else [2 * index + 1, 2 * index + 2]
+        links = "".join(
+            f'<li><a href="https://{SITE_HOST}{CLONE_PREFIX}{c}/">clone {c}</a></li>'
+            for c in children
+            if c < self.scale
+        )
+        return f'<ul class="bench-clones">{links}</ul>'.encode()
+
+    def page_body(self, path: str) -> bytes | None:
+        if path in self.pages:
+            body = self.pages[path]
+            extra = self.clone_links(None) if path == "/" else b""
+        elif path.startswith(CLONE_PREFIX):
+            try:
+                index = int(path[len(CLONE_PREFIX) :].strip("/"))
+            except ValueError:
+                return None
+            if not 0 <= index < self.scale:
+                return None
+            body = self.templates[index % len(self.templates)]
+            extra = self.clone_links(index)
+        else:
+            return None
+        if not extra:
+            return body
+        cut = body.rfind(b"</body>")
+        if cut < 0:
+            return body + extra
+        return body[:cut] + extra + body[cut:]
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "zcf-bench/1.0"
+    state: SiteState
+
+    def log_message(self, format: str, *args) -> None:
+        return
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        state = self.state
+        if state.latency:
+            time.sleep(state.latency)
+        path = urlsplit(self.path).path or "/"
+        if (
+            path != "/"
+            and "." not in path.rsplit("/", 1)[-1]
+            and not path.endswith("/")
+        ):
+            path += "/"
+
+        if state.should_fail():
+            state.count("errors_injected")
+            self._send(503, b"injected failure", "text/plain")
+            return
+
+        body = state.page_body(path)
+        if body is not None:
+            state.count("pages_served", len(body))
+            self._send(200, body, CONTENT_TYPES[".html"])
+            return
+
+        asset = state.assets.get(path)
+        if asset is not None:
+            body = asset.read_bytes()
+            state.count("assets_served", len(body))
+            ctype = CONTENT_TYPES.get(asset.suffix.lower(), "application/octet-stream")
+            self._send(200, body, ctype)
+            return
+
+        state.count("not_found")
+        self._send(404, b"not found", "text/plain")
+
+    do_HEAD = do_GET
+
+
+def start_server(state: SiteState, port: int = 0) -> ThreadingHTTPServer:
+    handler = type("BoundSiteHandler", (SiteHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def rewrite_url(url: str, target: str) -> str:
+    u = urlsplit(url)
+    if (u.netloc or "").lower() not in ORIGIN_HOSTS:
+        return url
+    t = urlsplit(target)
+    return urlunsplit((t.scheme, t.netloc, u.path or "/", u.query, ""))
+
+
+class OriginRewriteMiddleware:
+    """Scrapy downloader middleware that sends site requests to the bench server.
+
+    The response is handed back to the spider under its original URL so link
+    normalization and the internal-host checks behave exactly as in production.
+    """
+
+    def __init__(self, target: str):
+        self.target = target
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get("BENCH_TARGET"))
+
+    def process_request(self, request, spider):
+        if "bench_origin_url" in request.meta:
+            return None
+        local = rewrite_url(request.url, self.target)
+        if local == request.url:
+            return None
+        meta = {**request.meta, "bench_origin_url": request.url}
+        return request.replace(url=local, meta=meta, dont_filter=True)
+
+    def process_response(self, request, response, spider):
+        original = request.meta.get("bench_origin_url")
+        if original:
+            return response.replace(url=original)
+        return response
+
+
+def run_spider(target: str, out_dir: Path) -> None:
+    from scrapy.crawler import CrawlerProcess
+
+    from zcfindia_spider import ZCFIndiaSpider
+
+    class BenchSpider(ZCFIndiaSpider):
+        name = "zcfindia_bench"
+        allowed_domains = [SITE_HOST, "127.0.0.1"]
+        # Production settings minus politeness throttling, which would cap
+        # throughput at the configured delay instead of measuring the spider.
+        custom_settings = {
+            **ZCFIndiaSpider.custom_settings,
+            "ROBOTSTXT_OBEY": False,
+            "DOWNLOAD_DELAY": 0,
+            "AUTOTHROTTLE_ENABLED": False,
+            "CONCURRENT_REQUESTS": 16,
+            "CONCURRENT_REQUESTS_PER_DOMAIN": 16,
+            "RETRY_ENABLED": False,
+            "LOG_LEVEL": "WARNING",
+            # Every run must parse every page, not replay the last run's cache.
+            "EXTRACT_CACHE": "",
+        }
+
+    process = CrawlerProcess(
+        {
+            "BENCH_TARGET": target,
+            "DOWNLOADER_MIDDLEWARES": {"bench.OriginRewriteMiddleware": 50},
+            "FEEDS": {str(out_dir / "pages.jsonl"): {"format": "jsonlines"}},
+        }
+    )
+    process.crawl(BenchSpider)
+    process.start()
+
+
+def run_extract(target: str, out_dir: Path, max_pages: int) -> None:
+    sys.path.insert(0, str(REPO_ROOT))
+    import extract_har_to_raw as extractor
+
+    def fetch(url: str):
+        data, content_type, final_url = extractor.fetch_url(rewrite_url(url, target))
+        return data, content_type, (url if final_url else None)
+
+    extractor.crawl_live_pages(
+        [f"https://{SITE_HOST}/"],
+        {SITE_HOST},
+        out_dir,
+        max_pages=max_pages,
+        fetch=fetch,
+    )
+
+
+def run_download(target: str, out_dir: Path, pages_jsonl: Path, limit: int) -> None:
+    from requests.adapters import HTTPAdapter
+
+    import download_assets
+
+    class RewriteAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            request.url = rewrite_url(request.url, target)
+            return super().send(request, **kwargs)
+
+    sess = download_assets.make_session()
+    sess.mount("https://", RewriteAdapter())
+    sess.mount("http://", RewriteAdapter())
+    urls = download_assets.collect_candidates(
+        download_assets.load_jsonl(pages_jsonl), {SITE_HOST}, False, limit
+    )
+    # An empty HAR root keeps the existence check from skipping everything.
+    download_assets.download_urls(
+        sess, urls, out_dir / "assets", out_dir / "har_bodies"
+    )
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def measure_tool(tool: str, state: SiteState, target: str, args, work: Path) -> dict:
+    out_dir = work / tool
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        sys.executable,
+        str(Path(__file__).resolve()),
+        "tool",
+        tool,
+        "--target",
+        target,
+        "--out",
+        str(out_dir),
+        "--max-pages",
+        str(args.max_pages),
+        "--pages-jsonl",
+        str(args.pages_jsonl),
+        "--limit",
+        str(args.limit),
+    ]
+    state.reset()
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=TOOLS_DIR)
+    # wait4 gives the child's own rusage, unaffected by earlier tool runs.
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - started
+    served = state.reset()
+
+    mb = served["bytes_sent"] / (1024 * 1024)
+    return {
+        "tool": tool,
+        "exit_code": proc.returncode,
+        "wall_seconds": round(wall, 3),
+        "cpu_user_seconds": round(usage.ru_utime, 3),
+        "cpu_system_seconds": round(usage.ru_stime, 3),
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "pages": served["pages_served"],
+        "assets": served["assets_served"],
+        "pages_per_sec": round(served["pages_served"] / wall, 2) if wall else 0.0,
+        "mb_per_sec": round(mb / wall, 3) if wall else 0.0,
+        "server": served,
+    }
+
+
+def cmd_run(args) -> int:
+    pages, assets = load_site(args.raw)
+    if not pages:
+        print(f"No saved pages under {args.raw}/content/live_pages", file=sys.stderr)
+        return 1
+    state = SiteState(
+        pages, assets, args.scale, args.latency_ms, args.error_rate, args.seed
+    )
+    server = start_server(state)
+    target = f"http://127.0.0.1:{server.server_address[1]}"
+    if args.max_pages <= 0:
+        args.max_pages = len(pages) + args.scale
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="zcf-bench-") as tmp:
+            work = Path(tmp)
+            for tool in args.tools:
+                if tool == "download" and "spider" in args.tools:
+                    spider_out = work / "spider" / "pages.jsonl"
+                    if spider_out.exists():
+                        args.pages_jsonl = spider_out
+                results.append(measure_tool(tool, state, target, args, work))
+    finally:
+        server.shutdown()
+
+    report = {
+        "generated_at_utc": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "config": {
+            "seed_pages": len(pages),
+            "seed_assets": len(assets),
+            "scale": args.scale,
+            "latency_ms": args.latency_ms,
+            "error_rate": args.error_rate,
+            "seed": args.seed,
+            "max_pages": args.max_pages,
+            "limit": args.limit,
+        },
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    return 0 if all(r["exit_code"] == 0 for r in results) else 1
+
+
+def cmd_serve(args) -> int:
+    pages, assets = load_site(args.raw)
+    state = SiteState(
+        pages, assets, args.scale, args.latency_ms, args.error_rate, args.seed
+    )
+    server = start_server(state, args.port)
+    print(
+        f"Serving {len(pages)} pages (+{args.scale} clones) on http://127.0.0.1:{server.server_address[1]}"
+    )
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+def cmd_tool(args) -> int:
+    if args.tool == "spider":
+        run_spider(args.target, args.out)
+    elif args.tool == "extract":
+        run_extract(args.target, args.out, args.max_pages)
+    else:
+        run_download(args.target, args.out, args.pages_jsonl, args.limit)
+    return 0
+
+
+def add_site_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--raw", type=Path, default=REPO_ROOT / "raw")
+    ap.add_argument("--scale", type=int, default=0, help="synthetic cloned routes")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=1)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark crawl/extract/download tools")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="serve the saved site and time each tool")
+    add_site_args(run)
+    run.add_argument("--tools", nargs="+", choices=TOOLS, default=list(TOOLS))
+    run.add_argument("--max-pages", type=int, default=0, help="0 = every route")
+    run.add_argument(
+        "--pages-jsonl", type=Path, default=REPO_ROOT / "raw" / "scrapy" / "pages.jsonl"
+    )
+    run.add_argument("--limit", type=int, default=5000)
+    run.add_argument("--output", type=Path, default=Path("bench_results.json"))
+    run.set_defaults(func=cmd_run)
+
+    serve = sub.add_parser("serve", help="only run the local site stand-in")
+    add_site_args(serve)
+    serve.add_argument("--port", type=int, default=8765)
+    serve.set_defaults(func=cmd_serve)
+
+    tool = sub.add_parser("tool", help=argparse.SUPPRESS)
+    tool.add_argument("tool", choices=TOOLS)
+    tool.add_argument("--target", required=True)
+    tool.add_argument("--out", type=Path, required=True)
+    tool.add_argument("--max-pages", type=int, default=0)
+    tool.add_argument("--pages-jsonl", type=Path)
+    tool.add_argument("--limit", type=int, default=5000)
+    tool.set_defaults(func=cmd_tool)
+
+    args = ap.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,640 @@
+from __future__ import annotations
+
+import argparse
+import json
+import mimetypes
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Iterable
+
+import schema
+from schema import PageRecord
+from urls import join_url, url_to_rel_path
+
+
+PAGE_KINDS = {"home", "page"}
+POST_KINDS = {"post"}
+TITLE_SUFFIX = re.compile(r"\s+-\s+Zakat\s*&\s*Charitable\s*Foundation\s*$", re.I)
+PLACEHOLDER_TEXT = "Content was not captured in the current crawl snapshot."
+
+# Columns the loader writes; checked against the live database before any
+# write so a schema drift in the Payload collections fails loudly.
+_DOC_COLUMNS = {
+    "id",
+    "title",
+    "content",
+    "seo_meta_title",
+    "seo_meta_description",
+    "updated_at",
+    "created_at",
+}
+REQUIRED_COLUMNS = {
+    "pages": _DOC_COLUMNS | {"path", "hero_media_id"},
+    "pages_image_urls": {"_order", "_parent_id", "id", "url"},
+    "posts": _DOC_COLUMNS | {"slug", "published_at", "featured_image_id", "excerpt"},
+    "posts_image_urls": {"_order", "_parent_id", "id", "url"},
+    "media": {
+        "id",
+        "source_url",
+        "alt",
+        "filename",
+        "mime_type",
+        "filesize",
+        "url",
+        "updated_at",
+        "created_at",
+    },
+}
+
+SKIP_TAGS = {
+    "script",
+    "style",
+    "noscript",
+    "nav",
+    "header",
+    "footer",
+    "iframe",
+    "svg",
+    "form",
+    "button",
+    "select",
+    "textarea",
+}
+BLOCK_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6", "p", "li"}
+# Text sitting directly in these (outside any BLOCK_TAGS) still becomes a
+# paragraph; they only delimit it.
+CONTAINER_TAGS = {
+    "div",
+    "section",
+    "article",
+    "main",
+    "aside",
+    "blockquote",
+    "figure",
+    "figcaption",
+    "table",
+    "tr",
+    "td",
+    "th",
+    "dl",
+    "dt",
+    "dd",
+    "pre",
+    "address",
+    "ul",
+    "ol",
+}
+
+
+def payload_now() -> str:
+    now = datetime.now(timezone.utc)
+    return now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}Z"
+
+
+def payload_date(value: str | None) -> str | None:
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    dt = dt.astimezone(timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
+
+
+def normalize_pathname(value: str) -> str:
+    p = (value or "").strip()
+    if not p:
+        return "/"
+    if not p.startswith("/"):
+        p = f"/{p}"
+    if p != "/" and not p.endswith("/"):
+        p = f"{p}/"
+    return re.sub(r"/+", "/", p)
+
+
+def slug_from_pathname(value: str) -> str:
+    p = normalize_pathname(value)
+    if p == "/":
+        return "home"
+    return p.strip("/")
+
+
+def clean_title(title: str | None, fallback: str) -> str:
+    return TITLE_SUFFIX.sub("", title or "").strip() or fallback
+
+
+def best_from_srcset(srcset: str) -> str | None:
+    best: tuple[int, str] | None = None
+    for part in srcset.split(","):
+        bits = part.split()
+        if not bits:
+            continue
+        score = 0
+        size = bits[1] if len(bits) > 1 else ""
+        if re.fullmatch(r"\d+w", size):
+            score = int(size[:-1])
+        elif re.fullmatch(r"\d+(\.\d+)?x", size):
+            score = round(float(size[:-1]) * 1000)
+        if best is None or score >= best[0]:
+            best = (score, bits[0])
+    return best[1] if best else None
+
+
+class ContentParser(HTMLParser):
+    # Block-level text plus ordered image URLs from a crawled content_html
+    # fragment; mirrors the junk stripping in cms/src/scripts/import_raw.ts.
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.blocks: list[tuple[str, str, str | None]] = []
+        self.images: list[str] = []
+        self._seen_images: set[str] = set()
+        self._skip_depth = 0
+        self._stack: list[tuple[str, list[str]]] = []
+        self._list_tags: list[str] = []
+        # Text outside any block, emitted as a paragraph at the next boundary.
+        self._orphan: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in SKIP_TAGS:
+            self._flush_orphan()
+            self._skip_depth += 1
+            return
+        if self._skip_depth:
+            return
+        if tag in BLOCK_TAGS or tag in CONTAINER_TAGS:
+            self._flush_orphan()
+        if tag in {"ul", "ol"}:
+            self._list_tags.append(tag)
+        elif tag in BLOCK_TAGS and self._in_list_item(tag):
+            # <li><p>..</p></li>: the paragraph stays part of the item.
+            self._stack[-1][1].append("\n")
+        elif tag in BLOCK_TAGS:
+            self._stack.append((tag, []))
+        elif tag == "br":
+            (self._stack[-1][1] if self._stack else self._orphan).append("\n")
+        elif tag == "img":
+            self._add_image(dict(attrs))
+
+    def handle_startendtag(self, tag, attrs) -> None:
+        self.handle_starttag(tag, attrs)
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIP_TAGS:
+            if self._skip_depth:
+                self._skip_depth -= 1
+            return
+        if self._skip_depth:
+            return
+        if tag in BLOCK_TAGS or tag in CONTAINER_TAGS:
+            self._flush_orphan()
+        if tag in {"ul", "ol"} and self._list_tags:
+            self._list_tags.pop()
+        elif tag in BLOCK_TAGS and self._in_list_item(tag):
+            self._stack[-1][1].append("\n")
+        elif tag in BLOCK_TAGS and self._stack and self._stack[-1][0] == tag:
+            _, parts = self._stack.pop()
+            list_tag = self._list_tags[-1] if tag == "li" and self._list_tags else None
+            self._emit(tag, parts, list_tag)
+
+    def handle_data(self, data: str) -> None:
+        if self._skip_depth:
+            return
+        (self._stack[-1][1] if self._stack else self._orphan).append(data)
+
+    def close(self) -> None:
+        super().close()
+        self._flush_orphan()
+
+    def _in_list_item(self, tag: str) -> bool:
+        return tag != "li" and bool(self._stack) and self._stack[-1][0] == "li"
+
+    def _flush_orphan(self) -> None:
+        if self._orphan and not self._stack:
+            self._emit("p", self._orphan, None)
+            self._orphan = []
+
+    def _emit(self, tag: str, parts: list[str], list_tag: str | None) -> None:
+        text = re.sub(r"[ \t\r\f\v]+", " ", "".join(parts))
+        text = "\n".join(line.strip() for line in text.split("\n"))
+        text = re.sub(r"\n{2,}", "\n", text).strip()
+        if not text:
+            return
+        if self.blocks and self.blocks[-1][1].lower() == text.lower():
+            return
+        self.blocks.append((tag, text, list_tag))
+
+    def _add_image(self, attr: dict[str, str | None]) -> None:
+        candidates: list[str] = []
+        srcset = attr.get("srcset") or attr.get("data-srcset") or ""
+        best = best_from_srcset(srcset) if srcset else None
+        if best:
+            candidates.append(best)
+        for name in ("data-src", "data-lazy-src", "data-original", "src"):
+            value = attr.get(name)
+            if value:
+                candidates.append(value)
+        for raw in candidates:
+            raw = raw.strip()
+            if not raw or raw.startswith("data:"):
+                continue
+            if raw.startswith("//"):
+                raw = f"https:{raw}"
+            url = join_url(self.base_url, raw)
+            if not url.startswith(("http://", "https://")) or url in self._seen_images:
+                continue
+            self._seen_images.add(url)
+            self.images.append(url)
+            break
+
+
+def _text_node(text: str) -> dict:
+    return {
+        "detail": 0,
+        "format": 0,
+        "mode": "normal",
+        "style": "",
+        "text": text,
+        "type": "text",
+        "version": 1,
+    }
+
+
+def _element(node_type: str, children: list[dict], **extra) -> dict:
+    return {
+        "children": children,
+        "direction": "ltr",
+        "format": "",
+        "indent": 0,
+        "type": node_type,
+        "version": 1,
+        **extra,
+    }
+
+
+def lexical_from_blocks(blocks: list[tuple[str, str, str | None]]) -> dict:
+    children: list[dict] = []
+    for tag, text, list_tag in blocks:
+        inline = [_text_node(text)]
+        if tag == "li":
+            item = _element("listitem", inline, value=1)
+            prev = children[-1] if children else None
+            if prev and prev["type"] == "list" and prev["tag"] == list_tag:
+                item["value"] = len(prev["children"]) + 1
+                prev["children"].append(item)
+                continue
+            list_type = "number" if list_tag == "ol" else "bullet"
+            children.append(
+                _element(
+                    "list", [item], listType=list_type, start=1, tag=list_tag or "ul"
+                )
+            )
+        elif tag.startswith("h"):
+            children.append(_element("heading", inline, tag=tag))
+        else:
+            children.append(_element("paragraph", inline, textFormat=0, textStyle=""))
+    if not children:
+        children = [
+            _element(
+                "paragraph", [_text_node(PLACEHOLDER_TEXT)], textFormat=0, textStyle=""
+            )
+        ]
+    return {"root": _element("root", children)}
+
+
+def find_local_asset(url: str, asset_roots: list[Path]) -> Path | None:
+    rel = url_to_rel_path(url)
+    for root in asset_roots:
+        candidate = root / rel
+        if candidate.is_file() and candidate.stat().st_size > 0:
+            return candidate
+    return None
+
+
+def stage(
+    rows: Iterable[PageRecord], asset_roots: list[Path]
+) -> tuple[list[dict], list[dict], dict[str, dict]]:
+    pages: dict[str, dict] = {}
+    posts: dict[str, dict] = {}
+    media: dict[str, dict] = {}
+
+    for rec in rows:
+        if rec.kind not in PAGE_KINDS and rec.kind not in POST_KINDS:
+            continue
+        parser = ContentParser(rec.url)
+        parser.feed(rec.content_html or "")
+        parser.close()
+        content = json.dumps(lexical_from_blocks(parser.blocks), separators=(",", ":"))
+
+        hero = None
+        if rec.primary_image:
+            if rec.primary_image not in media:
+                local = find_local_asset(rec.primary_image, asset_roots)
+                if local is not None:
+                    media[rec.primary_image] = {
+                        "source_url": rec.primary_image,
+                        "local_file": local,
+                        "filename": local.name,
+                        "mime_type": mimetypes.guess_type(local.name)[0]
+                        or "application/octet-stream",
+                        "filesize": local.stat().st_size,
+                        "alt": clean_title(rec.title, local.stem),
+                    }
+            if rec.primary_image in media:
+                hero = rec.primary_image
+
+        if rec.kind in POST_KINDS:
+            slug = slug_from_pathname(rec.path)
+            posts[slug] = {
+                "title": clean_title(rec.title, slug),
+                "slug": slug,
+                "published_at": payload_date(rec.published_time),
+                "excerpt": rec.meta_description,
+                "content": content,
+                "media_source": hero,
+                "image_urls": parser.images,
+                "meta_description": rec.meta_description,
+            }
+        else:
+            path = normalize_pathname(rec.path)
+            title = clean_title(rec.title, "Page")
+            pages[path] = {
+                "title": title,
+                "path": path,
+                "content": content,
+                "media_source": hero,
+                "image_urls": parser.images,
+                "meta_description": rec.meta_description,
+            }
+
+    return list(pages.values()), list(posts.values()), media
+
+
+def assign_filenames(conn: sqlite3.Connection, media: dict[str, dict]) -> None:
+    # Payload requires unique media filenames across the whole collection, not
+    # just this run: a source already loaded keeps its filename, new ones are
+    # suffixed past every name in use.
+    existing = {
+        source: name
+        for source, name in conn.execute("SELECT source_url, filename FROM media")
+        if name
+    }
+    used = set(existing.values())
+    for item in media.values():
+        if item["source_url"] in existing:
+            item["filename"] = existing[item["source_url"]]
+    for item in media.values():
+        if item["source_url"] in existing:
+            continue
+        name = item["filename"]
+        stem, suffix = os.path.splitext(name)
+        n = 1
+        while name in used:
+            name = f"{stem}-{n}{suffix}"
+            n += 1
+        used.add(name)
+        item["filename"] = name
+
+
+def check_schema(conn: sqlite3.Connection) -> list[str]:
+    problems = []
+    for table, cols in REQUIRED_COLUMNS.items():
+        have = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+        if not have:
+            problems.append(f"missing table {table}")
+            continue
+        missing = cols - have
+        if missing:
+            problems.append(f"{table} missing columns {sorted(missing)}")
+    return problems
+
+
+def chunks(items: list, size: int) -> Iterable[list]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def apply_media(
+    conn: sqlite3.Connection,
+    media: dict[str, dict],
+    media_dir: Path,
+    chunk_size: int,
+    now: str,
+) -> dict[str, int]:
+    media_dir.mkdir(parents=True, exist_ok=True)
+    assign_filenames(conn, media)
+    items = list(media.values())
+    for item in items:
+        dest = media_dir / item["filename"]
+        if not dest.exists() or dest.stat().st_size != item["filesize"]:
+            shutil.copyfile(item["local_file"], dest)
+
+    ids: dict[str, int] = {}
+    for batch in chunks(items, chunk_size):
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO media (source_url, alt, filename, mime_type, filesize,
+                                   url, updated_at, created_at)
+                VALUES (:source_url, :alt, :filename, :mime_type, :filesize,
+                        '/api/media/file/' || :filename, :now, :now)
+                ON CONFLICT(source_url) DO UPDATE SET
+                    alt = excluded.alt,
+                    filename = excluded.filename,
+                    mime_type = excluded.mime_type,
+                    filesize = excluded.filesize,
+                    url = excluded.url,
+                    updated_at = excluded.updated_at
+                """,
+                [{**item, "now": now} for item in batch],
+            )
+            marks = ",".join("?" * len(batch))
+            for row_id, source in conn.execute(
+                f"SELECT id, source_url FROM media WHERE source_url IN ({marks})",
+                [item["source_url"] for item in batch],
+            ):
+                ids[source] = row_id
+    return ids
+
+
+def apply_docs(
+    conn: sqlite3.Connection,
+    table: str,
+    key: str,
+    upsert_sql: str,
+    docs: list[dict],
+    media_ids: dict[str, int],
+    chunk_size: int,
+    now: str,
+) -> int:
+    array_table = f"{table}_image_urls"
+    written = 0
+    for batch in chunks(docs, chunk_size):
+        params = [
+            {
+                **doc,
+                "media_id": media_ids.get(doc["media_source"] or ""),
+                "now": now,
+            }
+            for doc in batch
+        ]
+        with conn:
+            conn.executemany(upsert_sql, params)
+            marks = ",".join("?" * len(batch))
+            ids = dict(
+                conn.execute(
+                    f"SELECT {key}, id FROM {table} WHERE {key} IN ({marks})",
+                    [doc[key] for doc in batch],
+                )
+            )
+            conn.execute(
+                f"DELETE FROM {array_table} WHERE _parent_id IN ({marks})",
+                list(ids.values()),
+            )
+            conn.executemany(
+                f"INSERT INTO {array_table} (_order, _parent_id, id, url) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (order, ids[doc[key]], os.urandom(12).hex(), url)
+                    for doc in batch
+                    for order, url in enumerate(doc["image_urls"], start=1)
+                ],
+            )
+        written += len(batch)
+    return written
+
+
+def delta_urls(path: Path) -> set[str]:
+    return {
+        event["url"]
+        for event in schema.iter_jsonl(path, dict)
+        if event["type"] == "page" and event["op"] in {"added", "changed"}
+    }
+
+
+PAGES_UPSERT = """
+INSERT INTO pages (title, path, hero_media_id, content, seo_meta_title,
+                   seo_meta_description, updated_at, created_at)
+VALUES (:title, :path, :media_id, :content, :title, :meta_description, :now, :now)
+ON CONFLICT(path) DO UPDATE SET
+    title = excluded.title,
+    hero_media_id = coalesce(excluded.hero_media_id, pages.hero_media_id),
+    content = excluded.content,
+    seo_meta_title = excluded.seo_meta_title,
+    seo_meta_description = excluded.seo_meta_description,
+    updated_at = excluded.updated_at
+"""
+
+POSTS_UPSERT = """
+INSERT INTO posts (title, slug, published_at, featured_image_id, excerpt, content,
+                   seo_meta_title, seo_meta_description, updated_at, created_at)
+VALUES (:title, :slug, :published_at, :media_id, :excerpt, :content, :title,
+        :meta_description, :now, :now)
+ON CONFLICT(slug) DO UPDATE SET
+    title = excluded.title,
+    published_at = excluded.published_at,
+    featured_image_id = coalesce(excluded.featured_image_id, posts.featured_image_id),
+    excerpt = excluded.excerpt,
+    content = excluded.content,
+    seo_meta_title = excluded.seo_meta_title,
+    seo_meta_description = excluded.seo_meta_description,
+    updated_at = excluded.updated_at
+"""
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Bulk upsert crawled pages/posts/media into the Payload SQLite DB."
+    )
+    ap.add_argument(
+        "pages_jsonl", type=Path, nargs="?", default=Path("raw/scrapy/pages.jsonl")
+    )
+    ap.add_argument("--db", type=Path, default=Path("cms/payload.db"))
+    ap.add_argument("--media-dir", type=Path, default=Path("cms/media"))
+    ap.add_argument(
+        "--assets",
+        type=Path,
+        nargs="+",
+        default=[Path("raw/assets/live"), Path("raw/har_bodies")],
+        help="roots searched (in order) for local copies of hero images",
+    )
+    ap.add_argument("--chunk-size", type=int, default=500)
+    ap.add_argument(
+        "--delta",
+        type=Path,
+        help="crawl_diff.py output; only added/changed pages are loaded",
+    )
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    rows = schema.iter_jsonl(args.pages_jsonl, PageRecord)
+    if args.delta:
+        wanted = delta_urls(args.delta)
+        rows = (rec for rec in rows if rec.url in wanted)
+    pages, posts, media = stage(rows, args.assets)
+    summary = {
+        "pages": len(pages),
+        "posts": len(posts),
+        "media": len(media),
+        "image_url_rows": sum(len(d["image_urls"]) for d in pages + posts),
+    }
+    if args.dry_run:
+        print(json.dumps(summary, indent=2))
+        return 0
+
+    if not args.db.exists():
+        print(
+            f"{args.db} not found; start the CMS once so Payload creates the schema.",
+            file=sys.stderr,
+        )
+        return 1
+    conn = sqlite3.connect(args.db)
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        problems = check_schema(conn)
+        if problems:
+            print("Unexpected Payload schema: " + "; ".join(problems), file=sys.stderr)
+            return 1
+        now = payload_now()
+        media_ids = apply_media(conn, media, args.media_dir, args.chunk_size, now)
+        apply_docs(
+            conn,
+            "pages",
+            "path",
+            PAGES_UPSERT,
+            pages,
+            media_ids,
+            args.chunk_size,
+            now,
+        )
+        apply_docs(
+            conn,
+            "posts",
+            "slug",
+            POSTS_UPSERT,
+            posts,
+            media_ids,
+            args.chunk_size,
+            now,
+        )
+    finally:
+        conn.close()
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import msgspec
+
+import schema
+from schema import AssetRecord, HarBodyRecord, PageRecord
+from urls import normalize_asset_url, url_to_rel_path
+
+
+PAGE_FIELDS = (
+    "title",
+    "meta_description",
+    "content_text",
+    "content_html",
+    "images",
+    "out_links",
+)
+RUN_SIZE = 50_000
+
+_run_ids = itertools.count()
+
+
+def field_digest(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        value = "\n".join(value)
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def page_rows(pages_jsonl: Path) -> Iterator[list]:
+    # [url, path, kind, digest per PAGE_FIELDS...]; the page bodies are
+    # dropped as soon as they are hashed.
+    if not pages_jsonl.exists():
+        return
+    for rec in schema.iter_jsonl(pages_jsonl, PageRecord):
+        yield [rec.url, rec.path, rec.kind] + [
+            field_digest(getattr(rec, name)) for name in PAGE_FIELDS
+        ]
+
+
+def asset_rows(raw_dir: Path, missing: Counter[str]) -> Iterator[list]:
+    # [url, sha256, size] for HAR bodies and downloaded live assets. HAR
+    # bodies listed but not on disk are counted in missing, not diffed.
+    manifests = raw_dir / "manifests"
+    for rec in schema.read_manifest(manifests / "har_bodies.json", HarBodyRecord):
+        path = schema.har_body_path(raw_dir, rec)
+        if path.is_file():
+            yield [normalize_asset_url(rec.url), file_digest(path), path.stat().st_size]
+        else:
+            missing[str(raw_dir)] += 1
+    live_root = raw_dir / "assets" / "live"
+    for rec in schema.read_manifest(manifests / "live_assets.json", AssetRecord):
+        path = live_root / url_to_rel_path(rec.url)
+        if path.is_file():
+            yield [normalize_asset_url(rec.url), file_digest(path), path.stat().st_size]
+
+
+def external_sort(rows: Iterable[list], workdir: Path) -> Iterator[list]:
+    # Sorted runs of RUN_SIZE rows are spilled to disk and k-way merged, so
+    # memory is bounded by the run size rather than the crawl size.
+    # Rows sort on (url, arrival order) so _dedupe keeps the first seen; the
+    # sequence number is dropped again on the way out.
+    runs: list[Path] = []
+    buf: list[list] = []
+    for seq, row in enumerate(rows):
+        buf.append([row[0], seq, *row[1:]])
+        if len(buf) >= RUN_SIZE:
+            runs.append(_write_run(sorted(buf), workdir))
+            buf = []
+    if not runs:
+        yield from _dedupe(iter(sorted(buf)))
+        return
+    if buf:
+        runs.append(_write_run(sorted(buf), workdir))
+    yield from _dedupe(heapq.merge(*(_read_run(p) for p in runs)))
+
+
+def _write_run(rows: list[list], workdir: Path) -> Path:
+    path = workdir / f"run-{next(_run_ids)}.jsonl"
+    schema.write_jsonl(path, rows)
+    return path
+
+
+def _read_run(path: Path) -> Iterator[list]:
+    dec = msgspec.json.Decoder(list)
+    with path.open("rb") as f:
+        for line in f:
+            yield dec.decode(line)
+
+
+def _dedupe(rows: Iterator[list]) -> Iterator[list]:
+    # A crawl can record the same URL twice (e.g. redirects); keep the first
+    # (for assets, the HAR body over a later live download).
+    last = None
+    for row in rows:
+        if row[0] != last:
+            last = row[0]
+            yield [row[0], *row[2:]]
+
+
+def merge_join(
+    old: Iterator[list], new: Iterator[list]
+) -> Iterator[tuple[list | None, list | None]]:
+    a = next(old, None)
+    b = next(new, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield a, None
+            a = next(old, None)
+        elif a is None or b[0] < a[0]:
+            yield None, b
+            b = next(new, None)
+        else:
+            yield a, b
+            a = next(old, None)
+            b = next(new, None)
+
+
+def diff_pages(old_jsonl: Path, new_jsonl: Path, workdir: Path) -> Iterator[dict]:
+    old = external_sort(page_rows(old_jsonl), workdir)
+    new = external_sort(page_rows(new_jsonl), workdir)
+    for a, b in merge_join(old, new):
+        if a is None:
+            yield {
+                "type": "page",
+                "op": "added",
+                "url": b[0],
+                "path": b[1],
+                "kind": b[2],
+            }
+        elif b is None:
+            yield {
+                "type": "page",
+                "op": "removed",
+                "url": a[0],
+                "path": a[1],
+                "kind": a[2],
+            }
+        else:
+            fields = [
+                name for i, name in enumerate(PAGE_FIELDS, start=3) if a[i] != b[i]
+            ]
+            if a[2] != b[2]:
+                fields.insert(0, "kind")
+            if fields:
+                yield {
+                    "type": "page",
+                    "op": "changed",
+                    "url": b[0],
+                    "path": b[1],
+                    "kind": b[2],
+                    "fields": fields,
+                }
+
+
+def diff_assets(
+    old_raw: Path, new_raw: Path, workdir: Path, missing: Counter[str]
+) -> Iterator[dict]:
+    old = external_sort(asset_rows(old_raw, missing), workdir)
+    new = external_sort(asset_rows(new_raw, missing), workdir)
+    for a, b in merge_join(old, new):
+        if a is None:
+            yield {"type": "asset", "op": "added", "url": b[0], "size_bytes": b[2]}
+        elif b is None:
+            yield {"type": "asset", "op": "removed", "url": a[0], "size_bytes": a[2]}
+        elif a[1] != b[1]:
+            yield {
+                "type": "asset",
+                "op": "changed",
+                "url": b[0],
+                "size_bytes": b[2],
+                "old_size_bytes": a[2],
+            }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Stream a delta between two crawls (raw/ roots) keyed by digests."
+    )
+    ap.add_argument("old_raw", type=Path)
+    ap.add_argument("new_raw", type=Path)
+    ap.add_argument("--pages", default="scrapy/pages.jsonl", help="relative to raw/")
+    ap.add_argument("--out", type=Path, default=Path("raw/manifests/crawl_delta.jsonl"))
+    ap.add_argument("--no-assets", action="store_true")
+    args = ap.parse_args()
+
+    counts: Counter[str] = Counter()
+    changed_fields: Counter[str] = Counter()
+    missing: Counter[str] = Counter()
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="zcf-diff-") as tmp, args.out.open(
+        "wb"
+    ) as out:
+        workdir = Path(tmp)
+        streams = [
+            diff_pages(args.old_raw / args.pages, args.new_raw / args.pages, workdir)
+        ]
+        if not args.no_assets:
+            streams.append(diff_assets(args.old_raw, args.new_raw, workdir, missing))
+        for stream in streams:
+            for event in stream:
+                out.write(schema.encode_line(event))
+                counts[f"{event['type']}s_{event['op']}"] += 1
+                changed_fields.update(event.get("fields", ()))
+
+    print(
+        json.dumps(
+            {
+                "old": str(args.old_raw),
+                "new": str(args.new_raw),
+                "delta_file": str(args.out),
+                "counts": dict(sorted(counts.items())),
+                "page_fields_changed": dict(changed_fields.most_common()),
+                "har_bodies_missing": {
+                    "old": missing[str(args.old_raw)],
+                    "new": missing[str(args.new_raw)],
+                },
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
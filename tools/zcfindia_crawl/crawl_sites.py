@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import msgspec
+
+import download_assets
+from urls import split_url
+
+EXTRACT_SCRIPT = Path(__file__).resolve().parents[2] / "extract_har_to_raw.py"
+STAGES = ("extract", "crawl", "download")
+
+
+class SiteConfig(msgspec.Struct, kw_only=True):
+    name: str
+    start_urls: list[str]
+    # Default: the hosts of start_urls.
+    hosts: list[str] = []
+    # Default: raw/sites/<name>, laid out like raw/.
+    out: str | None = None
+    # Politeness: requests in flight and seconds between requests to the site.
+    concurrency: int = 2
+    delay: float = 0.5
+    # HAR captures for the extract stage (globs).
+    hars: list[str] = []
+    asset_limit: int = 500
+    only_primary: bool = False
+
+
+class RunConfig(msgspec.Struct, kw_only=True):
+    # Requests in flight across all sites.
+    pool: int = 16
+    sites: list[SiteConfig]
+
+
+def load_config(path: Path) -> RunConfig:
+    data = path.read_bytes()
+    if path.suffix == ".json":
+        cfg = msgspec.json.decode(data, type=RunConfig)
+    else:
+        cfg = msgspec.toml.decode(data, type=RunConfig)
+    names = [s.name for s in cfg.sites]
+    if len(set(names)) != len(names):
+        raise SystemExit(f"duplicate site names in {path}")
+    for site in cfg.sites:
+        if not site.hosts:
+            site.hosts = sorted({split_url(u).netloc.lower() for u in site.start_urls})
+        site.hosts = [h.lower() for h in site.hosts]
+        if site.out is None:
+            site.out = f"raw/sites/{site.name}"
+    return cfg
+
+
+def write_manifest(site: SiteConfig, name: str, data: dict) -> None:
+    path = Path(site.out) / "manifests" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+
+def run_extract(cfg: RunConfig, jobs: int) -> dict:
+    # One extract_har_to_raw.py process per site with HAR captures.
+    def extract(site: SiteConfig) -> dict:
+        # glob.glob, unlike Path.glob, also takes absolute patterns.
+        hars = sorted({p for pattern in site.hars for p in glob.glob(pattern)})
+        if not hars:
+            return {"site": site.name, "skipped": "no_hars"}
+        cmd = [sys.executable, str(EXTRACT_SCRIPT), "--raw-dir", site.out]
+        cmd += ["--har", *hars]
+        for host in site.hosts:
+            cmd += ["--host", host]
+        started = time.perf_counter()
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        result = {
+            "site": site.name,
+            "hars": len(hars),
+            "returncode": proc.returncode,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        if proc.returncode:
+            result["stderr"] = proc.stderr[-2000:]
+        return result
+
+    sites = [s for s in cfg.sites if s.hars]
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        results = list(pool.map(extract, sites))
+    return {r["site"]: r for r in results}
+
+
+def run_crawl(cfg: RunConfig) -> dict:
+    # One Scrapy engine for every site: CONCURRENT_REQUESTS is the shared
+    # pool, DOWNLOAD_SLOTS caps each site's hosts, and HostItemFilter splits
+    # the items into one pages.jsonl per site.
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.settings import Settings
+
+    from zcfindia_spider import HostItemFilter, ZCFIndiaSpider
+
+    feeds = {}
+    slots = {}
+    for site in cfg.sites:
+        pages = Path(site.out) / "scrapy" / "pages.jsonl"
+        pages.parent.mkdir(parents=True, exist_ok=True)
+        feeds[str(pages)] = {
+            "format": "jsonlines",
+            "overwrite": True,
+            "item_filter": HostItemFilter,
+            "hosts": site.hosts,
+            "other_hosts": [h for s in cfg.sites if s is not site for h in s.hosts],
+        }
+        for host in site.hosts:
+            slots[host.split(":")[0]] = {
+                "concurrency": site.concurrency,
+                "delay": site.delay,
+            }
+
+    settings = Settings()
+    settings.setdict(
+        {
+            "SITES": [
+                {"name": s.name, "hosts": s.hosts, "start_urls": s.start_urls}
+                for s in cfg.sites
+            ],
+            "FEEDS": feeds,
+            "CONCURRENT_REQUESTS": cfg.pool,
+            "DOWNLOAD_SLOTS": slots,
+            # Fixed per-site delays; AutoThrottle would retune them per slot.
+            "AUTOTHROTTLE_ENABLED": False,
+        },
+        priority="cmdline",
+    )
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(ZCFIndiaSpider)
+    started = time.perf_counter()
+    process.crawl(crawler)
+    process.start()
+    seconds = round(time.perf_counter() - started, 3)
+
+    results = {}
+    for site in cfg.sites:
+        pages = Path(site.out) / "scrapy" / "pages.jsonl"
+        count = 0
+        if pages.exists():
+            with pages.open("rb") as f:
+                count = sum(1 for _ in f)
+        result = {"pages": count, "pages_jsonl": str(pages)}
+        write_manifest(site, "crawl.json", result)
+        results[site.name] = result
+    stats = crawler.stats.get_stats()
+    results["_pool"] = {
+        "seconds": seconds,
+        "requests": stats.get("downloader/request_count", 0),
+        "responses": stats.get("downloader/response_count", 0),
+        "finish_reason": stats.get("finish_reason"),
+    }
+    return results
+
+
+@dataclass
+class SiteDownloads:
+    site: SiteConfig
+    queue: deque[str]
+    active: int = 0
+    next_at: float = 0.0
+    counts: dict[str, int] = field(
+        default_factory=lambda: {"downloaded": 0, "skipped_exists": 0, "failed": 0}
+    )
+
+
+def run_download(cfg: RunConfig) -> dict:
+    runs: list[SiteDownloads] = []
+    skipped: Counter[str] = Counter()
+    for site in cfg.sites:
+        out = Path(site.out)
+        pages = out / "scrapy" / "pages.jsonl"
+        candidates = []
+        if pages.exists():
+            candidates = download_assets.collect_candidates(
+                download_assets.load_jsonl(pages, skipped),
+                set(site.hosts),
+                site.only_primary,
+                site.asset_limit,
+            )
+        flagged = download_assets.flagged_files(
+            out / "manifests" / "integrity.json", out
+        )
+        run = SiteDownloads(site, deque())
+        for url in candidates:
+            if download_assets.is_present(
+                url, out / "assets" / "live", out / "har_bodies", flagged
+            ):
+                run.counts["skipped_exists"] += 1
+            else:
+                run.queue.append(url)
+        runs.append(run)
+
+    local = threading.local()
+
+    def fetch(url: str, out_root: Path) -> bool:
+        if not hasattr(local, "sess"):
+            local.sess = download_assets.make_session()
+        return download_assets.download_one(local.sess, url, out_root)
+
+    # The dispatcher only hands the pool work a site may start right now, so
+    # a slow or rate-limited site never holds pool threads hostage.
+    started = time.perf_counter()
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=cfg.pool) as pool:
+        while in_flight or any(r.queue for r in runs):
+            now = time.monotonic()
+            for run in runs:
+                if (
+                    run.queue
+                    and run.active < run.site.concurrency
+                    and run.next_at <= now
+                    and len(in_flight) < cfg.pool
+                ):
+                    url = run.queue.popleft()
+                    run.active += 1
+                    run.next_at = now + run.site.delay
+                    out_root = Path(run.site.out) / "assets" / "live"
+                    in_flight[pool.submit(fetch, url, out_root)] = run
+            # With the pool full nothing can start before a download ends, so
+            # block on completion rather than on a site's next_at.
+            waits = [
+                r.next_at - now
+                for r in runs
+                if r.queue and r.active < r.site.concurrency
+            ]
+            if len(in_flight) >= cfg.pool:
+                waits = []
+            timeout = max(0.0, min(waits)) if waits else None
+            if not in_flight:
+                time.sleep(timeout or 0)
+                continue
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for fut in done:
+                run = in_flight.pop(fut)
+                run.active -= 1
+                run.counts["downloaded" if fut.result() else "failed"] += 1
+
+    results = {}
+    for run in runs:
+        pages = Path(run.site.out) / "scrapy" / "pages.jsonl"
+        result = {
+            "candidates": sum(run.counts.values()),
+            **run.counts,
+            "skipped_lines": skipped[str(pages)],
+            "out_root": str(Path(run.site.out) / "assets" / "live"),
+        }
+        write_manifest(run.site, "downloads.json", result)
+        results[run.site.name] = result
+    results["_pool"] = {"seconds": round(time.perf_counter() - started, 3)}
+    return results
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Crawl, extract and download several sites over one shared pool."
+    )
+    ap.add_argument("config", type=Path, help="sites.toml (or .json)")
+    ap.add_argument(
+        "--stages", default=",".join(STAGES), help=f"comma list of {', '.join(STAGES)}"
+    )
+    ap.add_argument("--site", action="append", default=[], help="only these sites")
+    ap.add_argument("--extract-jobs", type=int, default=4)
+    ap.add_argument("--report", type=Path, default=Path("raw/sites/run.json"))
+    args = ap.parse_args()
+
+    cfg = load_config(args.config)
+    if args.site:
+        cfg.sites = [s for s in cfg.sites if s.name in set(args.site)]
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown or not cfg.sites:
+        print(f"unknown stages {sorted(unknown)} or no sites", file=sys.stderr)
+        return 2
+
+    report = {"sites": [s.name for s in cfg.sites], "pool": cfg.pool}
+    # Stage order is fixed: extract seeds raw/, crawl writes pages.jsonl,
+    # download reads it.
+    if "extract" in stages:
+        report["extract"] = run_extract(cfg, args.extract_jobs)
+    if "crawl" in stages:
+        report["crawl"] = run_crawl(cfg)
+    if "download" in stages:
+        report["download"] = run_download(cfg)
+
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    args.report.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
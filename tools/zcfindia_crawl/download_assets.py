@@ -3,83 +3,52 @@ from __future__ import annotations
 import argparse
 import json
 import sys
+from collections import Counter
 from pathlib import Path
-from urllib.parse import urlsplit, urlunsplit
+from typing import Iterable
 
 import requests
 
+import schema
+from schema import IntegrityManifest, PageRecord
+from urls import UrlTable, normalize_asset_url, split_url, url_to_rel_path
 
-def sha1_hex8(s: str) -> str:
-    import hashlib
 
-    return hashlib.sha1(s.encode("utf-8")).hexdigest()[:8]
+def load_jsonl(path: Path, skipped: Counter[str] | None = None):
+    # One bad line (e.g. from a crawl killed mid-write) must not end the run;
+    # such lines are counted in skipped.
+    if skipped is None:
+        skipped = Counter()
+    return schema.iter_jsonl(path, PageRecord, skipped)
 
 
-def url_to_rel_path(url: str) -> Path:
-    u = urlsplit(url)
-    host = (u.netloc or "unknown_host").lower()
-    path = u.path or "/"
-    if path.endswith("/"):
-        path = f"{path}index"
-    p = Path(path.lstrip("/"))
-    if u.query:
-        q_hash = sha1_hex8(u.query)
-        p = p.with_name(f"{p.stem}__q_{q_hash}{p.suffix}")
-    return Path(host) / p
-
-
-def normalize_url(url: str) -> str:
-    u = urlsplit(url)
-    return urlunsplit(("https", u.netloc.lower(), u.path or "/", u.query, ""))
-
-
-def load_jsonl(path: Path):
-    for line in path.read_text(encoding="utf-8", errors="replace").splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        yield json.loads(line)
-
-
-def main() -> int:
-    ap = argparse.ArgumentParser()
-    ap.add_argument("pages_jsonl", type=Path)
-    ap.add_argument("--out", type=Path, default=Path("raw/assets/live"))
-    ap.add_argument("--only-primary", action="store_true")
-    ap.add_argument("--limit", type=int, default=120)
-    args = ap.parse_args()
-
-    out_root: Path = args.out
-    out_root.mkdir(parents=True, exist_ok=True)
-
-    allowed_host = {"zcfindia.org"}
-
+def collect_candidates(
+    rows: Iterable[PageRecord], allowed_host: set[str], only_primary: bool, limit: int
+) -> list[str]:
     urls: list[str] = []
-    for row in load_jsonl(args.pages_jsonl):
-        if args.only_primary:
-            u = row.get("primary_image")
+    for row in rows:
+        if only_primary:
+            u = row.primary_image
             if isinstance(u, str) and u.startswith("http"):
                 urls.append(u)
             continue
-        for u in (row.get("images") or [])[:20]:
+        for u in row.images[:20]:
             if isinstance(u, str) and u.startswith("http"):
                 urls.append(u)
 
-    # de-dupe keep order
-    seen = set()
-    uniq: list[str] = []
+    # de-dupe keep order; the table assigns IDs in first-seen order
+    table = UrlTable()
     for u in urls:
-        nu = normalize_url(u)
-        host = urlsplit(nu).netloc.lower()
-        if host not in allowed_host:
-            continue
-        if nu in seen:
+        nu = normalize_asset_url(u)
+        if split_url(nu).netloc.lower() not in allowed_host:
             continue
-        seen.add(nu)
-        uniq.append(nu)
-        if len(uniq) >= args.limit:
+        table.intern(nu)
+        if len(table) >= limit:
             break
+    return list(table)
+
 
+def make_session() -> requests.Session:
     sess = requests.Session()
     sess.headers.update(
         {
@@ -87,44 +56,123 @@ def main() -> int:
             "Accept": "image/*,*/*;q=0.8",
         }
     )
-
+    return sess
+
+
+def flagged_files(integrity: Path, raw_dir: Path) -> set[str]:
+    # Files integrity_scan.py found empty, truncated or mistyped, as paths
+    # under raw_dir (the root that was scanned).
+    manifest = schema.read_document(integrity, IntegrityManifest)
+    if manifest is None:
+        return set()
+    return {
+        (raw_dir / key).as_posix()
+        for key, entry in manifest.files.items()
+        if entry.issues
+    }
+
+
+def is_present(
+    url: str, out_root: Path, har_root: Path, flagged: set[str] = frozenset()
+) -> bool:
+    # A usable copy in either har_bodies or the live bucket: non-empty and
+    # not flagged by the last integrity scan.
+    rel = url_to_rel_path(url)
+    for path in (har_root / rel, out_root / rel):
+        try:
+            size = path.stat().st_size
+        except OSError:
+            continue
+        if size and path.as_posix() not in flagged:
+            return True
+    return False
+
+
+def download_one(sess: requests.Session, url: str, out_root: Path) -> bool:
+    out_file = out_root / url_to_rel_path(url)
+    try:
+        r = sess.get(url, timeout=25)
+        mime = r.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        # An HTML body here is an error or challenge page, not the asset.
+        if r.status_code != 200 or not r.content or mime == "text/html":
+            return False
+        out_file.parent.mkdir(parents=True, exist_ok=True)
+        out_file.write_bytes(r.content)
+        return True
+    except Exception:
+        return False
+
+
+def download_urls(
+    sess: requests.Session,
+    urls: list[str],
+    out_root: Path,
+    har_root: Path,
+    flagged: set[str] = frozenset(),
+) -> dict:
     downloaded = 0
     skipped_exists = 0
     failed = 0
 
-    for url in uniq:
-        rel = url_to_rel_path(url)
-        out_file = out_root / rel
-        out_file.parent.mkdir(parents=True, exist_ok=True)
-
-        # Skip if already present in either har_bodies or live bucket.
-        har_file = Path("raw/har_bodies") / rel
-        if har_file.exists() or out_file.exists():
+    for url in urls:
+        if is_present(url, out_root, har_root, flagged):
             skipped_exists += 1
-            continue
-
-        try:
-            r = sess.get(url, timeout=25)
-            if r.status_code != 200 or not r.content:
-                failed += 1
-                continue
-            out_file.write_bytes(r.content)
+        elif download_one(sess, url, out_root):
             downloaded += 1
-        except Exception:
+        else:
             failed += 1
 
-    print(
-        json.dumps(
-            {
-                "candidates": len(uniq),
-                "downloaded": downloaded,
-                "skipped_exists": skipped_exists,
-                "failed": failed,
-                "out_root": str(out_root),
-            },
-            indent=2,
-        )
+    return {
+        "candidates": len(urls),
+        "downloaded": downloaded,
+        "skipped_exists": skipped_exists,
+        "failed": failed,
+        "out_root": str(out_root),
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pages_jsonl", type=Path)
+    ap.add_argument("--out", type=Path, default=Path("raw/assets/live"))
+    ap.add_argument("--har-root", type=Path, default=Path("raw/har_bodies"))
+    ap.add_argument(
+        "--integrity",
+        type=Path,
+        default=Path("raw/manifests/integrity.json"),
+        help="refetch files this integrity_scan.py manifest flags",
+    )
+    ap.add_argument("--only-primary", action="store_true")
+    ap.add_argument("--limit", type=int, default=120)
+    ap.add_argument(
+        "--host",
+        action="append",
+        default=[],
+        help="asset host to download from; repeatable (default: zcfindia.org)",
+    )
+    args = ap.parse_args()
+
+    out_root: Path = args.out
+    out_root.mkdir(parents=True, exist_ok=True)
+
+    allowed_host = {h.lower() for h in args.host} or {"zcfindia.org"}
+
+    skipped: Counter[str] = Counter()
+    uniq = collect_candidates(
+        load_jsonl(args.pages_jsonl, skipped),
+        allowed_host,
+        args.only_primary,
+        args.limit,
+    )
+    summary = download_urls(
+        make_session(),
+        uniq,
+        out_root,
+        args.har_root,
+        flagged_files(args.integrity, args.integrity.parent.parent),
     )
+    summary["skipped_lines"] = skipped.total()
+    print(json.dumps(summary, indent=2))
     return 0
 
 
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import inspect
+import json
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+
+
+# Under the repo's raw/, wherever the tool is run from.
+DEFAULT_PATH = Path(__file__).resolve().parents[2] / "raw" / "cache" / "extract.sqlite"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Evict down to this fraction of the budget so a full cache does not evict
+# on every put.
+LOW_WATER = 0.9
+COMMIT_EVERY = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    extractor TEXT NOT NULL,
+    version TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used_at ON entries(used_at);
+"""
+
+
+def extractor_version(*parts: object) -> str:
+    # Hash of the source of everything an extractor's output depends on, so
+    # editing one of those functions invalidates only that extractor's entries.
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            h.update(part.encode("utf-8"))
+        else:
+            h.update(inspect.getsource(inspect.unwrap(part)).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def html_digest(html: str | bytes) -> str:
+    if isinstance(html, str):
+        html = html.encode("utf-8", errors="surrogatepass")
+    return hashlib.sha256(html).hexdigest()
+
+
+# Extraction results (JSON-able dicts) keyed by extractor name + version +
+# base URL + SHA-256 of the HTML. Values are zlib-compressed JSON; the
+# least recently used entries are evicted once the total passes max_bytes.
+class ExtractCache:
+    def __init__(self, path: Path = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.total = self.conn.execute(
+            "SELECT coalesce(sum(size), 0) FROM entries"
+        ).fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._pending = 0
+
+    @staticmethod
+    def key(extractor: str, version: str, url: str, html: str | bytes) -> str:
+        return hashlib.sha256(
+            f"{extractor}\0{version}\0{url}\0{html_digest(html)}".encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        row = self.conn.execute(
+            "SELECT value FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute(
+            "UPDATE entries SET used_at = ? WHERE key = ?", (time.time(), key)
+        )
+        self._tick()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, extractor: str, version: str, value: dict) -> None:
+        blob = zlib.compress(
+            json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode(
+                "utf-8"
+            ),
+            6,
+        )
+        old = self.conn.execute(
+            "SELECT size FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (key, extractor, version, value, size, used_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, extractor, version, blob, len(blob), time.time()),
+        )
+        self.total += len(blob) - (old[0] if old else 0)
+        if self.total > self.max_bytes:
+            self.evict(int(self.max_bytes * LOW_WATER))
+        self._tick()
+
+    def get_or_extract(self, extractor: str, version: str, url: str, html, extract):
+        key = self.key(extractor, version, url, html)
+        value = self.get(key)
+        if value is None:
+            value = extract()
+            self.put(key, extractor, version, value)
+        return value
+
+    def evict(self, target: int) -> None:
+        rows = self.conn.execute("SELECT key, size FROM entries ORDER BY used_at")
+        doomed = []
+        for key, size in rows:
+            if self.total <= target:
+                break
+            doomed.append((key,))
+            self.total -= size
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        self.evicted += len(doomed)
+
+    def _tick(self) -> None:
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.conn.commit()
+            self._pending = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "bytes": self.total,
+        }
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Inspect or trim the extraction cache.")
+    ap.add_argument("--path", type=Path, default=DEFAULT_PATH)
+    ap.add_argument("--max-mb", type=float, help="evict down to this size")
+    ap.add_argument("--clear", action="store_true")
+    args = ap.parse_args()
+
+    cache = ExtractCache(args.path)
+    try:
+        if args.clear:
+            cache.conn.execute("DELETE FROM entries")
+            cache.total = 0
+        if args.max_mb is not None:
+            cache.evict(int(args.max_mb * 1024 * 1024))
+        rows = cache.conn.execute(
+            "SELECT extractor, version, count(*), sum(size), max(used_at) "
+            "FROM entries GROUP BY extractor, version ORDER BY extractor, 5 DESC"
+        ).fetchall()
+        summary = {
+            "path": str(args.path),
+            "bytes": cache.total,
+            "evicted": cache.evicted,
+            "extractors": [
+                {"extractor": e, "version": v, "entries": n, "bytes": b}
+                for e, v, n, b, _ in rows
+            ],
+        }
+    finally:
+        cache.close()
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
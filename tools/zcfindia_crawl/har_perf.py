@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from urls import split_url
+
+
+RESOURCE_TYPES = {
+    "document": "document",
+    "stylesheet": "stylesheet",
+    "script": "script",
+    "image": "image",
+    "font": "font",
+    "media": "media",
+    "xhr": "xhr",
+    "fetch": "xhr",
+}
+CACHEABLE_TYPES = {"stylesheet", "script", "image", "font", "media"}
+WEAK_MAX_AGE = 7 * 24 * 3600
+TIMING_PHASES = ("blocked", "dns", "connect", "ssl", "send", "wait", "receive")
+
+
+def resource_type(entry: dict, mime: str) -> str:
+    rt = RESOURCE_TYPES.get((entry.get("_resourceType") or "").lower())
+    if rt:
+        return rt
+    mime = mime.split(";")[0].strip().lower()
+    if mime == "text/html":
+        return "document"
+    if mime == "text/css":
+        return "stylesheet"
+    if "javascript" in mime or mime == "application/ecmascript":
+        return "script"
+    if mime.startswith("image/"):
+        return "image"
+    if mime.startswith("font/") or "font" in mime:
+        return "font"
+    if mime.startswith(("video/", "audio/")):
+        return "media"
+    if mime in {"application/json", "text/plain"}:
+        return "xhr"
+    return "other"
+
+
+def site_of(host: str) -> str:
+    # Last two labels; good enough to group zcfindia.org and www.zcfindia.org.
+    return ".".join(host.split(":")[0].split(".")[-2:])
+
+
+def parse_time(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp() * 1000
+    except ValueError:
+        return None
+
+
+def header_map(headers: list[dict]) -> dict[str, str]:
+    out: dict[str, str] = {}
+    for h in headers or []:
+        name = (h.get("name") or "").lower()
+        if name:
+            out[name] = h.get("value") or ""
+    return out
+
+
+def transfer_bytes(response: dict) -> int:
+    size = response.get("_transferSize")
+    if isinstance(size, (int, float)) and size >= 0:
+        return int(size)
+    body = response.get("bodySize") or 0
+    head = response.get("headersSize") or 0
+    return max(0, body) + max(0, head)
+
+
+def cache_findings(headers: dict[str, str]) -> list[str]:
+    problems = []
+    cc = headers.get("cache-control", "").lower()
+    if not cc and "expires" not in headers:
+        problems.append("missing_cache_control")
+    elif "no-store" in cc or "no-cache" in cc:
+        problems.append("no_store_or_no_cache")
+    else:
+        m = re.search(r"(?:s-)?max-age=(\d+)", cc)
+        if m and int(m.group(1)) < WEAK_MAX_AGE:
+            problems.append("short_max_age")
+    if "etag" not in headers and "last-modified" not in headers:
+        problems.append("no_validator")
+    return problems
+
+
+def entry_row(entry: dict, page_start: float | None) -> dict:
+    request = entry.get("request", {})
+    response = entry.get("response", {})
+    content = response.get("content", {}) or {}
+    mime = content.get("mimeType") or ""
+    url = request.get("url", "")
+    started = parse_time(entry.get("startedDateTime"))
+    timings = entry.get("timings", {}) or {}
+    phases = {
+        k: round(timings[k], 2)
+        for k in TIMING_PHASES
+        if isinstance(timings.get(k), (int, float)) and timings[k] >= 0
+    }
+    total = entry.get("time")
+    if not isinstance(total, (int, float)) or total < 0:
+        total = sum(phases.values())
+    offset = (
+        (started - page_start)
+        if started is not None and page_start is not None
+        else 0.0
+    )
+    initiator = entry.get("_initiator") or {}
+    initiator_url = initiator.get("url")
+    if not initiator_url:
+        frames = ((initiator.get("stack") or {}).get("callFrames")) or []
+        initiator_url = frames[0].get("url") if frames else None
+    return {
+        "url": url,
+        "host": split_url(url).netloc.lower(),
+        "status": int(response.get("status") or 0),
+        "type": resource_type(entry, mime),
+        "mime": mime.split(";")[0].strip(),
+        "priority": entry.get("_priority"),
+        "initiator": initiator_url,
+        "start_ms": round(offset, 2),
+        "end_ms": round(offset + total, 2),
+        "time_ms": round(total, 2),
+        "timings": phases,
+        "transfer_bytes": transfer_bytes(response),
+        "content_bytes": max(0, int(content.get("size") or 0)),
+        "headers": header_map(response.get("headers", [])),
+    }
+
+
+def critical_path(rows: list[dict], dom_content_loaded: float | None) -> dict:
+    # Render-blocking = the document plus CSS and synchronous-looking JS that
+    # starts before DOMContentLoaded (or before the document finishes when the
+    # HAR has no page timings). Chrome's _priority refines the JS guess.
+    docs = [r for r in rows if r["type"] == "document"]
+    if not docs:
+        return {"ms": 0, "blocking": [], "chain": []}
+    doc = min(docs, key=lambda r: r["start_ms"])
+    cutoff = dom_content_loaded if dom_content_loaded is not None else doc["end_ms"]
+    blocking = [doc]
+    for r in rows:
+        if r is doc or r["start_ms"] > cutoff:
+            continue
+        if r["type"] == "stylesheet":
+            blocking.append(r)
+        elif r["type"] == "script" and r["priority"] not in {"Low", "VeryLow"}:
+            blocking.append(r)
+    last = max(blocking, key=lambda r: r["end_ms"])
+
+    by_url = {r["url"]: r for r in rows}
+    chain, seen = [last], {last["url"]}
+    while chain[-1]["initiator"] in by_url and chain[-1]["initiator"] not in seen:
+        parent = by_url[chain[-1]["initiator"]]
+        chain.append(parent)
+        seen.add(parent["url"])
+    if chain[-1] is not doc:
+        chain.append(doc)
+    return {
+        "ms": round(last["end_ms"] - doc["start_ms"], 2),
+        "blocking": [
+            {"url": r["url"], "type": r["type"], "end_ms": r["end_ms"]}
+            for r in sorted(blocking, key=lambda r: r["end_ms"])
+        ],
+        "chain": [r["url"] for r in reversed(chain)],
+    }
+
+
+def analyze_page(page: dict, rows: list[dict], first_party: set[str]) -> dict:
+    timings = page.get("pageTimings", {}) or {}
+    dcl = timings.get("onContentLoad")
+    dcl = dcl if isinstance(dcl, (int, float)) and dcl >= 0 else None
+    onload = timings.get("onLoad")
+
+    weight: Counter[str] = Counter()
+    requests: Counter[str] = Counter()
+    third_bytes = third_requests = 0
+    third_hosts: Counter[str] = Counter()
+    cache_issues = []
+    for r in rows:
+        weight[r["type"]] += r["transfer_bytes"]
+        requests[r["type"]] += 1
+        if site_of(r["host"]) not in first_party:
+            third_bytes += r["transfer_bytes"]
+            third_requests += 1
+            third_hosts[r["host"]] += r["transfer_bytes"]
+        if r["status"] == 200 and r["type"] in CACHEABLE_TYPES:
+            problems = cache_findings(r["headers"])
+            if problems:
+                cache_issues.append(
+                    {
+                        "url": r["url"],
+                        "type": r["type"],
+                        "cache_control": r["headers"].get("cache-control"),
+                        "problems": problems,
+                    }
+                )
+    total_bytes = sum(weight.values())
+    return {
+        "id": page.get("id"),
+        "url": page.get("title"),
+        "started": page.get("startedDateTime"),
+        "dom_content_loaded_ms": dcl,
+        "load_ms": onload if isinstance(onload, (int, float)) and onload >= 0 else None,
+        "requests": len(rows),
+        "transfer_bytes": total_bytes,
+        "bytes_by_type": dict(weight.most_common()),
+        "requests_by_type": dict(requests.most_common()),
+        "third_party": {
+            "requests": third_requests,
+            "bytes": third_bytes,
+            "byte_share": round(third_bytes / total_bytes, 4) if total_bytes else 0.0,
+            "top_hosts": dict(third_hosts.most_common(10)),
+        },
+        "critical_path": critical_path(rows, dcl),
+        "cache_issues": cache_issues,
+        "waterfall": [
+            {k: v for k, v in r.items() if k != "headers"}
+            for r in sorted(rows, key=lambda r: r["start_ms"])
+        ],
+    }
+
+
+def analyze_har(path: Path) -> list[dict]:
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        log = json.load(f).get("log", {})
+    pages = log.get("pages", []) or []
+    entries = log.get("entries", []) or []
+
+    by_page: dict[str | None, list[dict]] = defaultdict(list)
+    for entry in entries:
+        by_page[entry.get("pageref")].append(entry)
+    if not pages:
+        # Some exporters omit pages; treat the capture as one page.
+        pages = [{"id": None, "title": str(path.name)}]
+        by_page = {None: entries}
+
+    out = []
+    for page in pages:
+        page_entries = by_page.get(page.get("id"), [])
+        start = parse_time(page.get("startedDateTime"))
+        if start is None and page_entries:
+            start = min(
+                (parse_time(e.get("startedDateTime")) or 0.0) for e in page_entries
+            )
+        rows = [entry_row(e, start) for e in page_entries]
+        title = page.get("title") or ""
+        hosts = [split_url(title).netloc] if title.startswith("http") else []
+        hosts += [r["host"] for r in rows if r["type"] == "document"][:1]
+        first_party = {site_of(h.lower()) for h in hosts if h}
+        result = analyze_page(page, rows, first_party)
+        result["har_file"] = path.name
+        out.append(result)
+    return out
+
+
+def summary_table(pages: list[dict]) -> str:
+    header = (
+        f"{'page':<48} {'reqs':>5} {'KB':>8} {'3p%':>6} "
+        f"{'crit ms':>8} {'DCL ms':>8} {'load ms':>8} {'cache!':>6}"
+    )
+    lines = [header, "-" * len(header)]
+    for p in pages:
+        url = (p["url"] or "")[-48:]
+
+        def ms(v):
+            return f"{v:.0f}" if isinstance(v, (int, float)) else "-"
+
+        lines.append(
+            f"{url:<48} {p['requests']:>5} {p['transfer_bytes'] / 1024:>8.1f} "
+            f"{p['third_party']['byte_share'] * 100:>6.1f} "
+            f"{ms(p['critical_path']['ms']):>8} {ms(p['dom_content_loaded_ms']):>8} "
+            f"{ms(p['load_ms']):>8} {len(p['cache_issues']):>6}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Per-page waterfall, critical path, weight and cache audit from HAR files."
+    )
+    ap.add_argument("hars", type=Path, nargs="*")
+    ap.add_argument("--out", type=Path, default=Path("raw/manifests/har_perf.json"))
+    args = ap.parse_args()
+
+    hars = args.hars or sorted(Path(".").glob("*.har"))
+    if not hars:
+        print("No .har files given or found in current directory.", file=sys.stderr)
+        return 1
+
+    pages = []
+    for har in hars:
+        pages.extend(analyze_har(har))
+
+    totals: Counter[str] = Counter()
+    for p in pages:
+        totals.update(p["bytes_by_type"])
+    issue_counts: Counter[str] = Counter(
+        problem
+        for p in pages
+        for issue in p["cache_issues"]
+        for problem in issue["problems"]
+    )
+    report = {
+        "har_files": [h.name for h in hars],
+        "pages": len(pages),
+        "transfer_bytes": sum(totals.values()),
+        "bytes_by_type": dict(totals.most_common()),
+        "cache_issue_counts": dict(issue_counts.most_common()),
+        "page_reports": pages,
+    }
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(summary_table(pages))
+    print(f"\nwrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import re
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import schema
+from schema import ImageIndex, ImageMeta, ImagePath
+
+try:
+    from PIL import Image
+except ImportError:  # optional: dimensions still come from the headers
+    Image = None
+
+
+IMAGE_SUFFIXES = {
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".webp",
+    ".avif",
+    ".svg",
+    ".ico",
+}
+HEAD_BYTES = 64 * 1024
+PLACEHOLDER_PX = 16
+NO_PLACEHOLDER = {"svg", "unknown", "unreadable"}
+
+
+# The size parsers return None for a head too short to hold the header, so a
+# truncated download is indexed without dimensions instead of raising.
+def png_size(head: bytes) -> tuple[int, int] | None:
+    if len(head) < 24 or head[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", head[16:24])
+
+
+def gif_size(head: bytes) -> tuple[int, int] | None:
+    if len(head) < 10:
+        return None
+    return struct.unpack("<HH", head[6:10])
+
+
+def webp_size(head: bytes) -> tuple[int, int] | None:
+    if len(head) < 30:
+        return None
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        w, h = struct.unpack("<HH", head[26:30])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b"VP8L" and head[20:21] == b"\x2f":
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        w = int.from_bytes(head[24:27], "little") + 1
+        h = int.from_bytes(head[27:30], "little") + 1
+        return w, h
+    return None
+
+
+def avif_size(head: bytes) -> tuple[int, int] | None:
+    # First 'ispe' (image spatial extents) property box in the meta box.
+    at = head.find(b"ispe")
+    if at < 0 or len(head) < at + 16:
+        return None
+    return struct.unpack(">II", head[at + 8 : at + 16])
+
+
+def ico_size(head: bytes) -> tuple[int, int] | None:
+    if len(head) < 8:
+        return None
+    return head[6] or 256, head[7] or 256
+
+
+def jpeg_size(f) -> tuple[int, int] | None:
+    # Walk segment headers only; SOFn carries the frame size.
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            f.seek(-1, 1)
+            continue
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        seg = f.read(2)
+        if len(seg) < 2:
+            return None
+        (length,) = struct.unpack(">H", seg)
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            h, w = struct.unpack(">xHH", frame)
+            return w, h
+        f.seek(length - 2, 1)
+
+
+SVG_ATTR = re.compile(rb'\b(width|height|viewBox)\s*=\s*["\']([^"\']+)["\']')
+
+
+def svg_size(head: bytes) -> tuple[int, int] | None:
+    tag = head[head.find(b"<svg") :]
+    tag = tag[: tag.find(b">") + 1]
+    attrs = {k.decode(): v.decode() for k, v in SVG_ATTR.findall(tag)}
+    try:
+        return (
+            round(float(attrs["width"].removesuffix("px"))),
+            round(float(attrs["height"].removesuffix("px"))),
+        )
+    except (KeyError, ValueError):
+        pass
+    box = attrs.get("viewBox", "").replace(",", " ").split()
+    if len(box) == 4:
+        try:
+            return round(float(box[2])), round(float(box[3]))
+        except ValueError:
+            return None
+    return None
+
+
+def sniff(path: Path) -> tuple[str, tuple[int, int] | None]:
+    # Format from magic bytes (file extensions in raw/ are guessed from MIME).
+    with path.open("rb") as f:
+        head = f.read(HEAD_BYTES)
+        if head.startswith(b"\x89PNG\r\n\x1a\n"):
+            return "png", png_size(head)
+        if head.startswith(b"\xff\xd8"):
+            return "jpeg", jpeg_size(f)
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return "gif", gif_size(head)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return "webp", webp_size(head)
+        if head[4:12] in (b"ftypavif", b"ftypavis"):
+            return "avif", avif_size(head)
+        if head[:4] == b"\x00\x00\x01\x00":
+            return "ico", ico_size(head)
+        if b"<svg" in head:
+            return "svg", svg_size(head)
+    return "unknown", None
+
+
+def placeholder(path: Path) -> str | None:
+    # Tiny WebP data URI (LQIP) for blur-up; needs Pillow.
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as im:
+            im.draft("RGB", (PLACEHOLDER_PX * 4, PLACEHOLDER_PX * 4))
+            im = im.convert("RGB")
+            im.thumbnail((PLACEHOLDER_PX, PLACEHOLDER_PX))
+            buf = io.BytesIO()
+            im.save(buf, "WEBP", quality=40)
+    except Exception:
+        return None
+    return "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def file_digest(path: Path) -> str | None:
+    # None when the file vanished or became unreadable since the scan.
+    try:
+        with path.open("rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except OSError:
+        return None
+
+
+def scan(roots: list[Path]) -> list[Path]:
+    files = []
+    for root in roots:
+        if root.is_dir():
+            files.extend(
+                p
+                for p in root.rglob("*")
+                if p.is_file() and p.suffix.lower() in IMAGE_SUFFIXES
+            )
+    return sorted(files)
+
+
+def describe(path: Path, want_placeholder: bool) -> ImageMeta:
+    try:
+        size_bytes = path.stat().st_size
+        fmt, size = sniff(path)
+    except OSError:
+        # Vanished or unreadable since the scan; one bad file must not abort
+        # the whole index.
+        fmt, size, size_bytes = "unreadable", None, 0
+    return ImageMeta(
+        format=fmt,
+        width=size[0] if size else None,
+        height=size[1] if size else None,
+        size_bytes=size_bytes,
+        placeholder=(
+            placeholder(path)
+            if want_placeholder and fmt not in NO_PLACEHOLDER
+            else None
+        ),
+    )
+
+
+def build_index(
+    files: list[Path], previous: ImageIndex, workers: int, placeholders: bool
+) -> tuple[ImageIndex, dict]:
+    index = ImageIndex()
+    stats = {
+        "files": len(files),
+        "hashed": 0,
+        "unreadable": 0,
+        "new_digests": 0,
+        "placeholders": 0,
+    }
+
+    # Unchanged (size, mtime) keeps its digest without reading the file.
+    # Files that cannot be read are left out; the next run picks them up.
+    to_hash: list[tuple[str, Path, int, int]] = []
+    for path in files:
+        try:
+            st = path.stat()
+        except OSError:
+            stats["unreadable"] += 1
+            continue
+        key = path.as_posix()
+        old = previous.paths.get(key)
+        if old and old.size_bytes == st.st_size and old.mtime_ns == st.st_mtime_ns:
+            index.paths[key] = old
+        else:
+            to_hash.append((key, path, st.st_size, st.st_mtime_ns))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = pool.map(lambda item: file_digest(item[1]), to_hash)
+        for (key, _, size, mtime_ns), digest in zip(to_hash, digests):
+            if digest is None:
+                stats["unreadable"] += 1
+                continue
+            index.paths[key] = ImagePath(
+                digest=digest, size_bytes=size, mtime_ns=mtime_ns
+            )
+            stats["hashed"] += 1
+
+        # One representative file per digest that needs (re)describing.
+        pending: dict[str, Path] = {}
+        for key, entry in index.paths.items():
+            meta = previous.images.get(entry.digest)
+            if entry.digest in index.images or entry.digest in pending:
+                continue
+            needs_lqip = (
+                placeholders
+                and Image is not None
+                and meta is not None
+                and meta.placeholder is None
+                and meta.format not in NO_PLACEHOLDER
+            )
+            if meta is None or needs_lqip:
+                pending[entry.digest] = Path(key)
+            else:
+                index.images[entry.digest] = meta
+        stats["new_digests"] = sum(1 for d in pending if d not in previous.images)
+
+        metas = pool.map(lambda p: describe(p, placeholders), pending.values())
+        for digest, meta in zip(pending, metas):
+            index.images[digest] = meta
+            stats["placeholders"] += meta.placeholder is not None
+
+    stats["digests"] = len(index.images)
+    return index, stats
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Index width/height/format and a blur placeholder for every image."
+    )
+    ap.add_argument(
+        "roots",
+        type=Path,
+        nargs="*",
+        default=[
+            Path("raw/assets/live"),
+            Path("raw/har_bodies"),
+            Path("public/gallery"),
+        ],
+    )
+    ap.add_argument("--out", type=Path, default=Path("raw/manifests/image_index.json"))
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--no-placeholders", action="store_true")
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    previous = schema.read_document(args.out, ImageIndex) or ImageIndex()
+    files = scan(args.roots)
+    index, stats = build_index(
+        files, previous, args.workers, placeholders=not args.no_placeholders
+    )
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    schema.write_manifest(args.out, index)
+
+    if Image is None and not args.no_placeholders:
+        print("Pillow not installed; placeholders skipped.", file=sys.stderr)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["out"] = str(args.out)
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
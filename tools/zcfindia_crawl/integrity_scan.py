@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import schema
+from schema import FileCheck, HarBodyRecord, IntegrityManifest
+
+
+HEAD_BYTES = 4096
+TAIL_BYTES = 1024
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+SKIP_DIRS = {"cache"}
+
+MAGIC = [
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"wOFF", "woff"),
+    (b"wOF2", "woff2"),
+    (b"OTTO", "otf"),
+    (b"\x00\x01\x00\x00", "ttf"),
+    (b"%PDF-", "pdf"),
+    (b"\x00\x00\x01\x00", "ico"),
+    (b"\x1f\x8b", "gzip"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+    (b"PK\x03\x04", "zip"),
+    (b"SQLite format 3\x00", "sqlite"),
+]
+IMAGE_KINDS = {"png", "jpeg", "gif", "webp", "avif", "svg", "ico"}
+MIME_KINDS = {
+    "image/png": "png",
+    "image/jpeg": "jpeg",
+    "image/jpg": "jpeg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/avif": "avif",
+    "image/svg+xml": "svg",
+    "image/x-icon": "ico",
+    "image/vnd.microsoft.icon": "ico",
+    "font/woff": "woff",
+    "application/font-woff": "woff",
+    "application/x-font-woff": "woff",
+    "font/woff2": "woff2",
+    "application/font-woff2": "woff2",
+    "font/ttf": "ttf",
+    "application/x-font-ttf": "ttf",
+    "font/otf": "otf",
+    "application/pdf": "pdf",
+    "text/html": "html",
+    "video/mp4": "mp4",
+}
+TEXT_KINDS = {"text", "html", "svg"}
+# Control bytes other than \t \n \f \r; a few slip into real text files.
+CONTROL_BYTES = bytes([*range(0x09), 0x0B, *range(0x0E, 0x20), 0x7F])
+TEXT_MIMES = ("text/", "application/json", "application/xml", "application/ld+json")
+SUFFIX_KINDS = {
+    ".png": "png",
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".gif": "gif",
+    ".webp": "webp",
+    ".avif": "avif",
+    ".svg": "svg",
+    ".ico": "ico",
+    ".woff": "woff",
+    ".woff2": "woff2",
+    ".ttf": "ttf",
+    ".otf": "otf",
+    ".pdf": "pdf",
+    ".mp4": "mp4",
+    ".html": "html",
+    ".htm": "html",
+    ".css": "text",
+    ".js": "text",
+    ".mjs": "text",
+    ".json": "text",
+    ".txt": "text",
+    ".md": "text",
+    ".xml": "text",
+    ".cdx": "text",
+    ".gz": "gzip",
+}
+# Bot walls and error pages saved in place of the real response.
+CHALLENGE_MARKERS = (
+    b"just a moment...",
+    b"cf-browser-verification",
+    b"challenge-platform",
+    b"attention required!",
+    b"<title>403 forbidden",
+    b"<title>404 not found",
+    b"<title>access denied",
+)
+
+
+def expected_from_mime(mime: str) -> str | None:
+    mime = mime.split(";")[0].strip().lower()
+    if mime in MIME_KINDS:
+        return MIME_KINDS[mime]
+    if "javascript" in mime or mime.startswith(TEXT_MIMES):
+        return "text"
+    if mime.startswith("image/"):
+        return "image"
+    return None
+
+
+def sfnt_header(head: bytes) -> bool:
+    # Apple "true" fonts: the table count and its searchRange must agree, so
+    # text that merely starts with "true" is not taken for one.
+    num_tables = int.from_bytes(head[4:6], "big")
+    if not 1 <= num_tables <= 64 or len(head) < 12:
+        return False
+    search_range = 16 << (num_tables.bit_length() - 1)
+    return int.from_bytes(head[6:8], "big") == search_range
+
+
+def looks_like_text(head: bytes) -> bool:
+    # For files in a legacy encoding (Latin-1 CSS and the like).
+    return len(head.translate(None, CONTROL_BYTES)) >= 0.99 * len(head)
+
+
+def sniff(head: bytes, expected: str | None = None) -> str:
+    for magic, kind in MAGIC:
+        if head.startswith(magic):
+            return kind
+    if head[:4] == b"true" and sfnt_header(head):
+        return "ttf"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp":
+        return "avif" if head[8:12] in (b"avif", b"avis") else "mp4"
+    if b"\x00" in head:
+        return "binary"
+    try:
+        # A multi-byte character may straddle the end of the sample.
+        head[:-4].decode("utf-8")
+    except UnicodeDecodeError:
+        if expected not in TEXT_KINDS or not looks_like_text(head):
+            return "binary"
+    start = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if start.startswith((b"<!doctype html", b"<html")) or b"<head" in start[:1024]:
+        return "html"
+    if b"<svg" in start[:1024]:
+        return "svg"
+    return "text"
+
+
+def truncated(kind: str, m, size: int) -> bool:
+    # Structural end-of-file checks; formats without one are never flagged.
+    tail = m[max(0, size - TAIL_BYTES) :]
+    if kind == "png":
+        return not tail.endswith(b"IEND\xaeB`\x82")
+    if kind == "jpeg":
+        return b"\xff\xd9" not in tail.rstrip(b"\x00\r\n")[-32:]
+    if kind == "gif":
+        return not tail.rstrip(b"\x00").endswith(b"\x3b")
+    if kind == "webp":
+        return size < int.from_bytes(m[4:8], "little") + 8
+    if kind in ("woff", "woff2"):
+        return size < int.from_bytes(m[8:12], "big")
+    if kind == "pdf":
+        return b"%%EOF" not in tail
+    return False
+
+
+def compatible(expected: str, kind: str) -> bool:
+    if expected == kind:
+        return True
+    if expected == "image":
+        return kind in IMAGE_KINDS
+    if expected == "text":
+        return kind in {"text", "svg"}
+    if expected == "html":
+        return kind == "text"
+    if expected == "svg":
+        return kind == "text"
+    return False
+
+
+def check_file(
+    path: Path, expected: str | None, expected_size: int | None
+) -> FileCheck:
+    st = path.stat()
+    issues: list[str] = []
+    if st.st_size == 0:
+        kind, digest = "empty", EMPTY_SHA256
+        # Some responses really are empty (204s, beacons); the HAR says so.
+        if expected_size != 0:
+            issues.append("empty")
+    else:
+        with path.open("rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as m:
+            # hashlib releases the GIL on large buffers, so threads hash in
+            # parallel straight from the page cache.
+            digest = hashlib.sha256(m).hexdigest()
+            head = m[:HEAD_BYTES]
+            kind = sniff(head, expected)
+            if truncated(kind, m, st.st_size):
+                issues.append("truncated")
+        if kind == "html" and any(
+            marker in head.lower() for marker in CHALLENGE_MARKERS
+        ):
+            issues.append("challenge_page")
+        if expected and not compatible(expected, kind):
+            if kind == "html":
+                issues.append("html_error_page")
+            else:
+                issues.append("type_mismatch")
+    if expected_size is not None and st.st_size != expected_size:
+        issues.append("size_mismatch")
+    return FileCheck(
+        size_bytes=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        sha256=digest,
+        kind=kind,
+        expected=expected,
+        issues=issues,
+    )
+
+
+def expectations(root: Path) -> dict[str, tuple[str | None, int | None]]:
+    # HAR bodies carry the response MIME and byte count; everything else is
+    # judged by its file extension. Keyed by path relative to root, like the
+    # manifest, whatever directory the extractor or this scan ran from.
+    out: dict[str, tuple[str | None, int | None]] = {}
+    for manifest in sorted(root.glob("**/manifests/har_bodies.json")):
+        raw_dir = manifest.parent.parent
+        for rec in schema.read_manifest(manifest, HarBodyRecord):
+            path = schema.har_body_path(raw_dir, rec)
+            exp = (expected_from_mime(rec.mime), rec.size_bytes)
+            out[path.relative_to(root).as_posix()] = exp
+    return out
+
+
+def walk(root: Path, skip: set[str], exclude: set[str]) -> list[Path]:
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in skip)
+        for name in sorted(filenames):
+            path = Path(dirpath) / name
+            if path.as_posix() not in exclude and not name.startswith("."):
+                files.append(path)
+    return files
+
+
+def scan(
+    root: Path,
+    previous: IntegrityManifest,
+    workers: int,
+    skip: set[str],
+    exclude: set[str],
+) -> tuple[IntegrityManifest, dict]:
+    expected = expectations(root)
+    manifest = IntegrityManifest()
+    stats = {"files": 0, "checked": 0, "reused": 0, "bytes_hashed": 0}
+
+    to_check: list[tuple[str, Path, str | None, int | None]] = []
+    for path in walk(root, skip, exclude):
+        key = path.relative_to(root).as_posix()
+        exp, exp_size = expected.get(key, (None, None))
+        if exp is None:
+            exp = SUFFIX_KINDS.get(path.suffix.lower())
+        st = path.stat()
+        old = previous.files.get(key)
+        if (
+            old is not None
+            and old.size_bytes == st.st_size
+            and old.mtime_ns == st.st_mtime_ns
+            and old.expected == exp
+        ):
+            manifest.files[key] = old
+            stats["reused"] += 1
+        else:
+            to_check.append((key, path, exp, exp_size))
+    stats["files"] = len(manifest.files) + len(to_check)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda item: check_file(*item[1:]), to_check)
+        for (key, *_), result in zip(to_check, results):
+            manifest.files[key] = result
+            stats["bytes_hashed"] += result.size_bytes
+    stats["checked"] = len(to_check)
+    manifest.files = dict(sorted(manifest.files.items()))
+    return manifest, stats
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Hash every file under raw/ and flag empty, truncated and mistyped ones."
+    )
+    ap.add_argument("root", type=Path, nargs="?", default=Path("raw"))
+    ap.add_argument("--out", type=Path, help="default: <root>/manifests/integrity.json")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    ap.add_argument("--skip-dir", action="append", default=sorted(SKIP_DIRS))
+    ap.add_argument(
+        "--strict", action="store_true", help="exit 1 when issues are found"
+    )
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    out = args.out or args.root / "manifests" / "integrity.json"
+    previous = schema.read_document(out, IntegrityManifest) or IntegrityManifest()
+    manifest, stats = scan(
+        args.root, previous, args.workers, set(args.skip_dir), {out.as_posix()}
+    )
+    out.parent.mkdir(parents=True, exist_ok=True)
+    schema.write_manifest(out, manifest)
+
+    issues: Counter[str] = Counter()
+    flagged = []
+    for key, entry in manifest.files.items():
+        issues.update(entry.issues)
+        if entry.issues:
+            flagged.append({"file": key, "kind": entry.kind, "issues": entry.issues})
+    stats["issues"] = dict(issues.most_common())
+    stats["flagged_files"] = len(flagged)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["out"] = str(out)
+    print(json.dumps(stats, indent=2))
+    for item in flagged[:50]:
+        print(
+            f"{','.join(item['issues']):<28} {item['kind']:<8} {item['file']}",
+            file=sys.stderr,
+        )
+    return 1 if args.strict and flagged else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
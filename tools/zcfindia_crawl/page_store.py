@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed once a directory has been packed
+    zstandard = None
+
+
+# A directory D is packed into the sibling D.zstore/:
+#   dict.<n>.bin    zstd dictionary trained on samples of D
+#   frames.<n>.bin  one dictionary-compressed frame per file, concatenated
+#   index.json      {"generation": n, "dict": ..., "frames": ...,
+#                    "files": {rel_path: [offset, length, size]}, ...}
+# Each pack writes a new generation n and then replaces index.json, which is
+# the only commit step: until then readers keep using the previous one.
+# Reads go through read_bytes()/read_text(), which prefer a loose file and
+# fall back to the store, so packing is invisible to callers.
+
+STORE_SUFFIX = ".zstore"
+DICT_SIZE = 112 * 1024
+SAMPLE_BYTES = 16 * 1024
+LEVEL = 19
+
+
+def store_dir_for(root: Path) -> Path:
+    return root.with_name(root.name + STORE_SUFFIX)
+
+
+def _require_zstd() -> None:
+    if zstandard is None:
+        raise SystemExit("zstandard is not installed; run `uv pip install zstandard`.")
+
+
+class PageStore:
+    def __init__(self, store_dir: Path):
+        _require_zstd()
+        self.store_dir = store_dir
+        meta = json.loads((store_dir / "index.json").read_text(encoding="utf-8"))
+        self.files: dict[str, list[int]] = meta["files"]
+        self.generation: int = meta.get("generation", 0)
+        # Stores packed before generations name neither file.
+        zdict_path = store_dir / meta.get("dict", "dict.bin")
+        zdict = zstandard.ZstdCompressionDict(zdict_path.read_bytes())
+        self._dctx = zstandard.ZstdDecompressor(dict_data=zdict)
+        self._fh = (store_dir / meta.get("frames", "frames.bin")).open("rb")
+
+    def __contains__(self, rel: str) -> bool:
+        return rel in self.files
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def keys(self) -> list[str]:
+        return sorted(self.files)
+
+    def read_bytes(self, rel: str) -> bytes:
+        offset, length, size = self.files[rel]
+        self._fh.seek(offset)
+        return self._dctx.decompress(self._fh.read(length), max_output_size=size)
+
+    def read_text(self, rel: str, encoding: str = "utf-8") -> str:
+        return self.read_bytes(rel).decode(encoding, errors="replace")
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+_stores: dict[Path, PageStore | None] = {}
+
+
+def _open_store(root: Path) -> PageStore | None:
+    if root not in _stores:
+        store_dir = store_dir_for(root)
+        has_store = (store_dir / "index.json").is_file()
+        _stores[root] = PageStore(store_dir) if has_store else None
+    return _stores[root]
+
+
+def _locate(path: Path) -> tuple[PageStore, str] | None:
+    for root in path.parents:
+        if not root.name:
+            break
+        store = _open_store(root)
+        if store is not None:
+            rel = path.relative_to(root).as_posix()
+            if rel in store:
+                return store, rel
+    return None
+
+
+def read_bytes(path: Path) -> bytes:
+    if path.is_file():
+        return path.read_bytes()
+    hit = _locate(path)
+    if hit is None:
+        raise FileNotFoundError(path)
+    store, rel = hit
+    return store.read_bytes(rel)
+
+
+def read_text(path: Path, encoding: str = "utf-8") -> str:
+    return read_bytes(path).decode(encoding, errors="replace")
+
+
+def exists(path: Path) -> bool:
+    return path.is_file() or _locate(path) is not None
+
+
+def iter_files(root: Path) -> Iterator[str]:
+    # Relative POSIX paths under root, loose or packed, sorted.
+    rels = set()
+    if root.is_dir():
+        rels.update(
+            p.relative_to(root).as_posix() for p in root.rglob("*") if p.is_file()
+        )
+    # root may be the packed directory itself or any directory inside it.
+    for base in (root, *root.parents):
+        if not base.name:
+            break
+        store = _open_store(base)
+        if store is None:
+            continue
+        prefix = root.relative_to(base).as_posix() + "/" if base != root else ""
+        rels.update(k[len(prefix) :] for k in store.files if k.startswith(prefix))
+        break
+    yield from sorted(rels)
+
+
+def train_dictionary(
+    read, rels: list[str], dict_size: int, sample_files: int, seed: int
+):
+    # Page chrome repeats across the site, so slices of a few hundred pages
+    # are enough; slicing also gives zstd enough samples on small sites.
+    picked = random.Random(seed).sample(rels, min(sample_files, len(rels)))
+    samples = []
+    for rel in picked:
+        data = read(rel)
+        samples.extend(
+            data[i : i + SAMPLE_BYTES] for i in range(0, len(data), SAMPLE_BYTES)
+        )
+    try:
+        return zstandard.train_dictionary(dict_size, samples)
+    except zstandard.ZstdError:
+        # Too little input for the trainer (a handful of pages): use the
+        # samples themselves as a raw-content dictionary instead.
+        content = b"".join(samples)[-dict_size:]
+        return zstandard.ZstdCompressionDict(
+            content, dict_type=zstandard.DICT_TYPE_RAWCONTENT
+        )
+
+
+def pack(
+    root: Path,
+    dict_size: int = DICT_SIZE,
+    sample_files: int = 500,
+    level: int = LEVEL,
+    seed: int = 0,
+    remove_originals: bool = False,
+) -> dict:
+    _require_zstd()
+    store_dir = store_dir_for(root)
+    # Entries already in the store are re-framed with the new dictionary;
+    # a loose file with the same path replaces its packed copy.
+    old = _open_store(root)
+    loose = {
+        p.relative_to(root).as_posix(): p
+        for p in sorted(root.rglob("*"))
+        if p.is_file()
+    }
+    rels = sorted(set(loose) | set(old.files if old is not None else ()))
+    if not rels:
+        raise SystemExit(f"nothing to pack under {root}")
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    def read(rel: str) -> bytes:
+        path = loose.get(rel)
+        return path.read_bytes() if path is not None else old.read_bytes(rel)
+
+    zdict = train_dictionary(read, rels, dict_size, sample_files, seed)
+    cctx = zstandard.ZstdCompressor(level=level, dict_data=zdict, write_checksum=True)
+    index: dict[str, list[int]] = {}
+    raw_bytes = 0
+    generation = (old.generation if old is not None else 0) + 1
+    frames_name = f"frames.{generation}.bin"
+    dict_name = f"dict.{generation}.bin"
+    with (store_dir / frames_name).open("wb") as out:
+        for rel in rels:
+            data = read(rel)
+            frame = cctx.compress(data)
+            index[rel] = [out.tell(), len(frame), len(data)]
+            out.write(frame)
+            raw_bytes += len(data)
+        packed_bytes = out.tell()
+        out.flush()
+        os.fsync(out.fileno())
+    (store_dir / dict_name).write_bytes(zdict.as_bytes())
+    tmp_index = store_dir / ".index.json.tmp"
+    tmp_index.write_text(
+        json.dumps(
+            {
+                "generation": generation,
+                "dict": dict_name,
+                "frames": frames_name,
+                "level": level,
+                "dict_bytes": len(zdict.as_bytes()),
+                "files": index,
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+
+    # The commit: a crash before this leaves the previous generation intact
+    # (plus unreferenced files the next pack overwrites or removes).
+    if old is not None:
+        old.close()
+    _stores.pop(root, None)
+    os.replace(tmp_index, store_dir / "index.json")
+    for f in store_dir.glob("*.bin"):
+        if f.name not in (frames_name, dict_name):
+            f.unlink()
+
+    if remove_originals:
+        # Only after every frame round-trips.
+        store = PageStore(store_dir)
+        for rel, f in loose.items():
+            if store.read_bytes(rel) != f.read_bytes():
+                raise SystemExit(f"round-trip mismatch for {f}; originals kept")
+        store.close()
+        for f in loose.values():
+            f.unlink()
+        for d in sorted((p for p in root.rglob("*") if p.is_dir()), reverse=True):
+            if not any(d.iterdir()):
+                d.rmdir()
+
+    return {
+        "root": str(root),
+        "store": str(store_dir),
+        "files": len(index),
+        "loose_files": len(loose),
+        "raw_bytes": raw_bytes,
+        "packed_bytes": packed_bytes,
+        "dict_bytes": len(zdict.as_bytes()),
+        "ratio": round(raw_bytes / max(1, packed_bytes + len(zdict.as_bytes())), 2),
+        "originals_removed": remove_originals,
+    }
+
+
+def unpack(root: Path) -> dict:
+    store = _open_store(root)
+    if store is None:
+        raise SystemExit(f"no store at {store_dir_for(root)}")
+    for rel in store.keys():
+        out = root / rel
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_bytes(store.read_bytes(rel))
+    return {"root": str(root), "files": len(store)}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Pack saved HTML/text into a zstd dictionary-compressed store."
+    )
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_pack = sub.add_parser("pack")
+    p_pack.add_argument(
+        "roots",
+        type=Path,
+        nargs="*",
+        default=[Path("raw/content/live_pages"), Path("raw/content/har_pages")],
+    )
+    p_pack.add_argument("--dict-size", type=int, default=DICT_SIZE)
+    p_pack.add_argument("--sample-files", type=int, default=500)
+    p_pack.add_argument("--level", type=int, default=LEVEL)
+    p_pack.add_argument("--seed", type=int, default=0)
+    p_pack.add_argument("--remove-originals", action="store_true")
+
+    p_unpack = sub.add_parser("unpack")
+    p_unpack.add_argument("roots", type=Path, nargs="+")
+
+    p_cat = sub.add_parser("cat")
+    p_cat.add_argument("path", type=Path)
+
+    args = ap.parse_args()
+
+    if args.cmd == "cat":
+        sys.stdout.buffer.write(read_bytes(args.path))
+        return 0
+    if args.cmd == "unpack":
+        print(json.dumps([unpack(r) for r in args.roots], indent=2))
+        return 0
+
+    results = []
+    for root in args.roots:
+        if not root.is_dir():
+            print(f"skip {root}: not a directory", file=sys.stderr)
+            continue
+        results.append(
+            pack(
+                root,
+                dict_size=args.dict_size,
+                sample_files=args.sample_files,
+                level=args.level,
+                seed=args.seed,
+                remove_originals=args.remove_originals,
+            )
+        )
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
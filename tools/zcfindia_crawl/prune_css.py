@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+
+import page_store
+import schema
+from schema import PageRecord
+
+
+# Classes toggled by theme/plugin JS after load never appear in the saved
+# HTML; selectors using them are kept.
+DEFAULT_SAFELIST = (
+    r"^(is-|has-|js-|no-js)",
+    r"(^|-)(active|open|opened|show|shown|visible|hidden|current|selected|sticky|"
+    r"fixed|loaded|loading|animated|fade|in|out|collapsed|collapsing|expanded|"
+    r"hover|focus|disabled|checked)$",
+    r"^(elementor-(motion|sticky|invisible|animation|lightbox)|animate__|swiper-|slick-)",
+    r"^(mfp-|fancybox-|dflip|df-|n2-|nextend-)",
+)
+GROUPING_AT_RULES = ("@media", "@supports", "@layer", "@container", "@document")
+
+
+@dataclass
+class SelectorIndex:
+    tags: set[str] = field(default_factory=lambda: {"html", "body"})
+    classes: set[str] = field(default_factory=set)
+    ids: set[str] = field(default_factory=set)
+    inline_css: list[str] = field(default_factory=list)
+    safelist: list[re.Pattern] = field(default_factory=list)
+
+    def has_class(self, name: str) -> bool:
+        return name in self.classes or any(p.search(name) for p in self.safelist)
+
+    def has_id(self, name: str) -> bool:
+        return name in self.ids or any(p.search(name) for p in self.safelist)
+
+
+class IndexCollector(HTMLParser):
+    def __init__(self, index: SelectorIndex):
+        super().__init__(convert_charrefs=True)
+        self.index = index
+        self._in_style = False
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.index.tags.add(tag.lower())
+        self._in_style = tag == "style"
+        for name, value in attrs:
+            if not value:
+                continue
+            if name == "class":
+                self.index.classes.update(value.split())
+            elif name == "id":
+                self.index.ids.add(value.strip())
+            elif name == "style":
+                self.index.inline_css.append("x{" + value + "}")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "style":
+            self._in_style = False
+
+    def handle_data(self, data: str) -> None:
+        # Inline <style> blocks reference @font-face families and keyframes
+        # defined in the external sheets.
+        if self._in_style:
+            self.index.inline_css.append(data)
+
+
+def build_index(
+    page_roots: list[Path], pages_jsonl: Path | None, safelist: list[str]
+) -> tuple[SelectorIndex, int]:
+    index = SelectorIndex(safelist=[re.compile(p) for p in safelist])
+    documents = 0
+    for root in page_roots:
+        for rel in page_store.iter_files(root):
+            if rel.endswith(".html"):
+                IndexCollector(index).feed(page_store.read_text(root / rel))
+                documents += 1
+    if pages_jsonl is not None and pages_jsonl.exists():
+        for rec in schema.iter_jsonl(pages_jsonl, PageRecord):
+            if rec.content_html:
+                IndexCollector(index).feed(rec.content_html)
+                documents += 1
+    return index, documents
+
+
+def parse_blocks(css: str) -> list[tuple[str, str | None]]:
+    # One nesting level: (prelude, body) for blocks, (statement, None) for
+    # `@import ...;`-style statements. Comments are dropped.
+    out: list[tuple[str, str | None]] = []
+    buf: list[str] = []
+    i, n = 0, len(css)
+    while i < n:
+        ch = css[i]
+        if ch == "/" and css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        if ch in "\"'":
+            end = _string_end(css, i)
+            buf.append(css[i:end])
+            i = end
+            continue
+        if ch == ";":
+            stmt = "".join(buf).strip()
+            if stmt:
+                out.append((stmt + ";", None))
+            buf = []
+        elif ch == "{":
+            end = _block_end(css, i)
+            out.append(("".join(buf).strip(), css[i + 1 : end - 1]))
+            buf = []
+            i = end
+            continue
+        elif ch != "}":
+            buf.append(ch)
+        i += 1
+    return out
+
+
+def _string_end(css: str, i: int) -> int:
+    quote = css[i]
+    j = i + 1
+    while j < len(css):
+        if css[j] == "\\":
+            j += 2
+            continue
+        if css[j] == quote or css[j] == "\n":
+            return j + 1
+        j += 1
+    return j
+
+
+def _block_end(css: str, i: int) -> int:
+    # Index just past the `}` matching the `{` at i.
+    depth = 0
+    j = i
+    while j < len(css):
+        ch = css[j]
+        if ch in "\"'":
+            j = _string_end(css, j)
+            continue
+        if ch == "/" and css.startswith("/*", j):
+            end = css.find("*/", j + 2)
+            j = len(css) if end < 0 else end + 2
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return j + 1
+        j += 1
+    return j
+
+
+def split_top_level(text: str, sep: str = ",") -> list[str]:
+    parts, depth, start, quote = [], 0, 0, ""
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote:
+                quote = ""
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+FUNCTIONAL_PSEUDO = re.compile(r"::?[\w-]+\(")
+ATTRIBUTE = re.compile(r"\[[^\]]*\]")
+PSEUDO = re.compile(r"::?[\w-]+")
+IDENT = r"((?:\\.|[\w-]|[^\x00-\x7f])+)"
+CLASS = re.compile(r"\." + IDENT)
+ID = re.compile(r"#" + IDENT)
+TAG = re.compile(r"^([a-zA-Z][\w-]*)")
+ESCAPE = re.compile(r"\\(.)")
+COMMENT = re.compile(r"/\*.*?\*/", re.S)
+
+
+def _strip_functional_pseudos(sel: str) -> str:
+    # :not(.x) / :is(...) / :has(...) arguments are dropped rather than
+    # evaluated, which can only keep more selectors, never fewer.
+    while True:
+        m = FUNCTIONAL_PSEUDO.search(sel)
+        if m is None:
+            return sel
+        depth, j = 1, m.end()
+        while j < len(sel) and depth:
+            depth += {"(": 1, ")": -1}.get(sel[j], 0)
+            j += 1
+        sel = sel[: m.start()] + sel[j:]
+
+
+def selector_can_match(sel: str, index: SelectorIndex) -> bool:
+    sel = _strip_functional_pseudos(sel)
+    sel = ATTRIBUTE.sub("", sel)
+    for compound in re.split(r"\s*[\s>+~]\s*", sel):
+        bare = PSEUDO.sub("", compound)
+        for name in CLASS.findall(bare):
+            if not index.has_class(ESCAPE.sub(r"\1", name)):
+                return False
+        for name in ID.findall(bare):
+            if not index.has_id(ESCAPE.sub(r"\1", name)):
+                return False
+        tag = TAG.match(bare)
+        if tag and tag.group(1).lower() not in index.tags:
+            return False
+    return True
+
+
+def declarations(body: str) -> list[tuple[str, str]]:
+    out = []
+    for decl in split_top_level(body, ";"):
+        prop, _, value = decl.partition(":")
+        out.append((prop.strip().lower(), value.strip()))
+    return out
+
+
+@dataclass
+class PruneStats:
+    rules_before: int = 0
+    rules_kept: int = 0
+    selectors_before: int = 0
+    selectors_kept: int = 0
+
+
+def prune_blocks(
+    blocks: list[tuple[str, str | None]],
+    index: SelectorIndex,
+    stats: PruneStats,
+    used: tuple[str, str] | None,
+) -> list[str]:
+    # used = (font-family values, animation values) from the kept rules;
+    # None keeps every @font-face/@keyframes (first pass).
+    out: list[str] = []
+    for prelude, body in blocks:
+        lower = prelude.lower()
+        if body is None:
+            out.append(prelude)
+        elif lower.startswith(GROUPING_AT_RULES):
+            inner = prune_blocks(parse_blocks(body), index, stats, used)
+            if inner:
+                out.append(prelude + "{" + "".join(inner) + "}")
+        elif lower.startswith("@font-face"):
+            family = dict(declarations(body)).get("font-family", "")
+            name = family.strip("\"' ").lower()
+            if used is None or (name and name in used[0]):
+                out.append(prelude + "{" + COMMENT.sub("", body).strip() + "}")
+        elif re.match(r"@(-\w+-)?keyframes", lower):
+            name = prelude.split(None, 1)[-1].strip("\"' ")
+            pattern = rf"(?<![\w-]){re.escape(name)}(?![\w-])"
+            if used is None or re.search(pattern, used[1]):
+                out.append(prelude + "{" + COMMENT.sub("", body).strip() + "}")
+        elif lower.startswith("@"):
+            out.append(prelude + "{" + COMMENT.sub("", body).strip() + "}")
+        else:
+            selectors = split_top_level(prelude)
+            kept = [s for s in selectors if selector_can_match(s, index)]
+            stats.rules_before += 1
+            stats.selectors_before += len(selectors)
+            stats.selectors_kept += len(kept)
+            if kept:
+                stats.rules_kept += 1
+                out.append(",".join(kept) + "{" + COMMENT.sub("", body).strip() + "}")
+    return out
+
+
+def used_names(blocks: list[tuple[str, str | None]]) -> tuple[str, str]:
+    fonts, animations = [], []
+    for prelude, body in blocks:
+        if body is None:
+            continue
+        if prelude.lower().startswith(GROUPING_AT_RULES):
+            f, a = used_names(parse_blocks(body))
+            fonts.append(f)
+            animations.append(a)
+        elif not prelude.startswith("@"):
+            for prop, value in declarations(body):
+                if prop.startswith("--"):
+                    # var(--primary-font) etc.; cheap to over-include.
+                    fonts.append(value.lower())
+                    animations.append(value)
+                elif prop in {"font-family", "font"}:
+                    fonts.append(value.lower())
+                elif "animation" in prop:
+                    animations.append(value)
+    return " ".join(fonts), " ".join(animations)
+
+
+def prune_stylesheet(
+    blocks: list[tuple[str, str | None]],
+    index: SelectorIndex,
+    used: tuple[str, str],
+) -> tuple[str, PruneStats]:
+    stats = PruneStats()
+    out = prune_blocks(blocks, index, stats, used)
+    return "\n".join(out) + "\n", stats
+
+
+def collect_used(sheets: list[list], index: SelectorIndex) -> tuple[str, str]:
+    # Font families and animations are defined in one sheet and used from
+    # another (Google Fonts vs. the theme), so usage is gathered site-wide
+    # from the selector-pruned rules plus inline styles.
+    fonts, animations = [], []
+    for blocks in sheets + [parse_blocks(css) for css in index.inline_css]:
+        kept = prune_blocks(blocks, index, PruneStats(), None)
+        f, a = used_names(parse_blocks("".join(kept)))
+        fonts.append(f)
+        animations.append(a)
+    return " ".join(fonts), " ".join(animations)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Drop CSS rules whose selectors cannot match any crawled page."
+    )
+    ap.add_argument("--css-root", type=Path, default=Path("raw/har_bodies"))
+    ap.add_argument(
+        "--pages",
+        type=Path,
+        nargs="*",
+        default=[Path("raw/content/live_pages")],
+        help="directories of saved .html pages",
+    )
+    ap.add_argument("--pages-jsonl", type=Path, default=Path("raw/scrapy/pages.jsonl"))
+    ap.add_argument("--out", type=Path, default=Path("raw/css_pruned"))
+    ap.add_argument("--report", type=Path, default=Path("raw/manifests/css_prune.json"))
+    ap.add_argument(
+        "--safelist",
+        action="append",
+        default=[],
+        help="extra regex for class/id names to always keep",
+    )
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    index, documents = build_index(
+        args.pages, args.pages_jsonl, list(DEFAULT_SAFELIST) + args.safelist
+    )
+    css_files = sorted(args.css_root.rglob("*.css"))
+    sources = [f.read_text(encoding="utf-8", errors="replace") for f in css_files]
+    sheets = [parse_blocks(css) for css in sources]
+    used = collect_used(sheets, index)
+    files = []
+    for css_file, css, blocks in zip(css_files, sources, sheets):
+        pruned, stats = prune_stylesheet(blocks, index, used)
+        rel = css_file.relative_to(args.css_root)
+        out_file = args.out / rel
+        out_file.parent.mkdir(parents=True, exist_ok=True)
+        out_file.write_text(pruned, encoding="utf-8")
+        before = len(css.encode("utf-8"))
+        after = len(pruned.encode("utf-8"))
+        files.append(
+            {
+                "file": str(css_file.as_posix()),
+                "pruned_file": str(out_file.as_posix()),
+                "bytes_before": before,
+                "bytes_after": after,
+                "bytes_saved": before - after,
+                "rules_before": stats.rules_before,
+                "rules_kept": stats.rules_kept,
+                "selectors_before": stats.selectors_before,
+                "selectors_kept": stats.selectors_kept,
+            }
+        )
+    files.sort(key=lambda f: f["bytes_saved"], reverse=True)
+
+    total_before = sum(f["bytes_before"] for f in files)
+    total_after = sum(f["bytes_after"] for f in files)
+    report = {
+        "documents_indexed": documents,
+        "tags": len(index.tags),
+        "classes": len(index.classes),
+        "ids": len(index.ids),
+        "stylesheets": len(files),
+        "bytes_before": total_before,
+        "bytes_after": total_after,
+        "bytes_saved": total_before - total_after,
+        "seconds": round(time.perf_counter() - started, 3),
+        "files": files,
+    }
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    args.report.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps({k: v for k, v in report.items() if k != "files"}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
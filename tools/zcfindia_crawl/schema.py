@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Iterator, TypeVar
+
+import msgspec
+
+from urls import url_to_rel_path
+
+T = TypeVar("T")
+
+
+class PageRecord(msgspec.Struct, kw_only=True):
+    url: str
+    path: str
+    kind: str = "unknown"
+    title: str | None = None
+    meta_description: str | None = None
+    published_time: str | None = None
+    modified_time: str | None = None
+    primary_image: str | None = None
+    images: list[str] = []
+    content_html: str | None = None
+    content_text: str | None = None
+    out_links: list[str] = []
+
+
+class HarBodyRecord(msgspec.Struct, kw_only=True, omit_defaults=True):
+    har_file: str | None
+    url: str
+    status: int
+    mime: str
+    size_bytes: int
+    file: str
+    source: str | None = None
+
+
+class MissingBodyRecord(msgspec.Struct, kw_only=True):
+    har_file: str | None
+    url: str
+    status: int
+    mime: str
+
+
+class AssetRecord(msgspec.Struct, kw_only=True):
+    url: str
+
+
+class AssetSkipRecord(msgspec.Struct, kw_only=True):
+    url: str
+    reason: str
+
+
+class LivePageRecord(msgspec.Struct, kw_only=True):
+    url: str
+    html_file: str
+    text_file: str
+    text_chars: int
+
+
+class PageTextRecord(msgspec.Struct, kw_only=True):
+    # har_page_text.json; live_pages.json records decode as this too.
+    url: str
+    text_file: str
+    text_chars: int
+
+
+class CrawlFailureRecord(msgspec.Struct, kw_only=True):
+    url: str
+    reason: str
+
+
+class ImageMeta(msgspec.Struct, kw_only=True):
+    format: str
+    width: int | None = None
+    height: int | None = None
+    size_bytes: int
+    placeholder: str | None = None
+
+
+class ImagePath(msgspec.Struct, kw_only=True):
+    digest: str
+    size_bytes: int
+    mtime_ns: int
+
+
+class ImageIndex(msgspec.Struct, kw_only=True):
+    # images is keyed by content digest, paths by file path.
+    images: dict[str, ImageMeta] = {}
+    paths: dict[str, ImagePath] = {}
+
+
+class FileCheck(msgspec.Struct, kw_only=True, omit_defaults=True):
+    size_bytes: int
+    mtime_ns: int
+    sha256: str
+    kind: str
+    expected: str | None = None
+    issues: list[str] = []
+
+
+class IntegrityManifest(msgspec.Struct, kw_only=True):
+    # Keyed by path relative to the scanned root; an entry is reused while
+    # size, mtime and the expected type are unchanged.
+    files: dict[str, FileCheck] = {}
+
+
+class PageAssets(msgspec.Struct, kw_only=True, omit_defaults=True):
+    hero: list[str] = []
+    inline: list[str] = []
+    other: list[str] = []
+    stylesheets: list[str] = []
+
+
+class AssetGraph(msgspec.Struct, kw_only=True):
+    # Route URL -> the assets its HTML references; stylesheet URL -> the
+    # url() and @import targets inside it, when its body is on disk.
+    routes: dict[str, PageAssets] = {}
+    stylesheets: dict[str, list[str]] = {}
+
+
+_encoder = msgspec.json.Encoder()
+_decoders: dict[type, msgspec.json.Decoder] = {}
+
+
+def _decoder(kind: type[T]) -> msgspec.json.Decoder:
+    dec = _decoders.get(kind)
+    if dec is None:
+        dec = _decoders[kind] = msgspec.json.Decoder(kind)
+    return dec
+
+
+def encode(obj) -> bytes:
+    return _encoder.encode(obj)
+
+
+def encode_line(obj) -> bytes:
+    buf = bytearray()
+    _encoder.encode_into(obj, buf)
+    buf += b"\n"
+    return bytes(buf)
+
+
+def to_dict(record: msgspec.Struct) -> dict:
+    # Shallow: list fields are shared, not copied like dataclasses.asdict.
+    return msgspec.structs.asdict(record)
+
+
+def iter_jsonl(
+    path: Path, kind: type[T], skipped: Counter[str] | None = None
+) -> Iterator[T]:
+    # Given skipped, a line that does not decode (torn write, stray non-UTF-8
+    # bytes) is counted under str(path) and left out instead of ending the read.
+    dec = _decoder(kind)
+    with path.open("rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                rec = dec.decode(line)
+            except (msgspec.DecodeError, UnicodeDecodeError):
+                if skipped is None:
+                    raise
+                skipped[str(path)] += 1
+                continue
+            yield rec
+
+
+def write_jsonl(path: Path, records: Iterable) -> int:
+    count = 0
+    buf = bytearray()
+    with path.open("wb") as f:
+        for rec in records:
+            _encoder.encode_into(rec, buf, -1)
+            buf += b"\n"
+            count += 1
+            if len(buf) >= 1 << 20:
+                f.write(buf)
+                buf.clear()
+        f.write(buf)
+    return count
+
+
+def read_manifest(path: Path, kind: type[T]) -> list[T]:
+    if not path.exists():
+        return []
+    return _decoder(list[kind]).decode(path.read_bytes())
+
+
+def read_document(path: Path, kind: type[T]) -> T | None:
+    if not path.exists():
+        return None
+    return _decoder(kind).decode(path.read_bytes())
+
+
+def write_manifest(path: Path, records) -> None:
+    # Pretty JSON like the existing manifests; written atomically.
+    data = msgspec.json.format(_encoder.encode(records), indent=2)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def har_body_path(raw_dir: Path, rec: HarBodyRecord) -> Path:
+    # rec.file is <extractor's --raw-dir>/har_bodies/<url_to_rel_path(url)>,
+    # relative to wherever the extractor ran; re-anchor it on the raw_dir
+    # being read. The URL fixes how many trailing segments are the body's own
+    # (the extension never changes the count), so "har_bodies" is found right
+    # after the recorded prefix even when a host or path segment shares it.
+    parts = Path(rec.file).parts
+    n = len(url_to_rel_path(rec.url).parts)
+    if len(parts) <= n or parts[-n - 1] != "har_bodies":
+        return raw_dir / rec.file
+    return raw_dir.joinpath("har_bodies", *parts[-n:])
@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing as mp
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+import extract_cache
+import schema
+from extract_cache import ExtractCache
+from urls import normalize_url, split_url
+from zcfindia_spider import EXTRACTOR_VERSION, ZCFIndiaSpider, extract_page
+
+
+HEADERS = {
+    "User-Agent": ZCFIndiaSpider.custom_settings["USER_AGENT"],
+    **ZCFIndiaSpider.custom_settings["DEFAULT_REQUEST_HEADERS"],
+}
+HTTP_TIMEOUT = 25
+
+
+def shard_of(url: str, shards: int) -> int:
+    # Stable across processes and machines (unlike hash()).
+    digest = hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def load_robots(hosts: set[str]) -> dict[str, RobotFileParser]:
+    robots = {}
+    for host in sorted(hosts):
+        rp = RobotFileParser()
+        try:
+            r = requests.get(
+                f"https://{host}/robots.txt", headers=HEADERS, timeout=HTTP_TIMEOUT
+            )
+            rp.parse(r.text.splitlines() if r.status_code == 200 else [])
+        except requests.RequestException:
+            rp.parse([])
+        robots[host] = rp
+    return robots
+
+
+# One worker's share of the per-host politeness budget: at most concurrency
+# requests in flight per host, and request starts at least interval apart.
+# Workers start offset by one delay each so their shares interleave.
+class HostBudget:
+    def __init__(self, concurrency: int, interval: float, offset: float):
+        self.concurrency = concurrency
+        self.interval = interval
+        self.offset = offset
+        self._lock = threading.Lock()
+        self._slots: dict[str, threading.BoundedSemaphore] = {}
+        self._next_at: dict[str, float] = {}
+
+    @contextmanager
+    def slot(self, host: str):
+        with self._lock:
+            sem = self._slots.setdefault(
+                host, threading.BoundedSemaphore(self.concurrency)
+            )
+        with sem:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_at.get(host, now + self.offset))
+                self._next_at[host] = start + self.interval
+            time.sleep(start - now)
+            yield
+
+
+def fetch(sess: requests.Session, url: str, budget: HostBudget):
+    try:
+        with budget.slot(split_url(url).netloc.lower()):
+            r = sess.get(url, timeout=HTTP_TIMEOUT)
+    except requests.RequestException:
+        return None
+    mime = r.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if r.status_code != 200 or mime != "text/html":
+        return None
+    return r.url, r.text, r.content
+
+
+# Worker protocol. Each worker owns the URLs with shard_of(url) == its id and
+# appends their pages to its own shard file. After each URL it reports
+# ("done", id, processed, out_links) to the coordinator, which dedupes the
+# links and puts each new one on its owner's inbox. Because only the
+# coordinator routes, its outstanding count (routed - processed) cannot hit
+# zero while work is in flight; at zero it puts None on every inbox.
+def run_worker(
+    worker_id: int,
+    inbox,
+    control,
+    out_dir: str,
+    allowed: list[str],
+    robots: dict[str, RobotFileParser],
+    fetch_threads: int,
+    max_pages: int,
+    cache_path: str | None,
+    host_concurrency: int,
+    host_interval: float,
+    host_offset: float,
+) -> None:
+    allowed_set = set(allowed)
+    budget = HostBudget(host_concurrency, host_interval, host_offset)
+    cache_version = f"{EXTRACTOR_VERSION}:{','.join(sorted(allowed_set))}"
+    cache = ExtractCache(Path(cache_path)) if cache_path else None
+    sess = requests.Session()
+    sess.headers.update(HEADERS)
+    fetched = 0
+    stats = {"pages": 0, "fetch_failed": 0, "over_limit": 0, "robots_denied": 0}
+    started = time.perf_counter()
+    parse_seconds = 0.0
+
+    shard = Path(out_dir) / f"pages.shard{worker_id:03d}.jsonl"
+    pending: dict = {}
+    stopping = False
+    with shard.open("wb") as out, ThreadPoolExecutor(fetch_threads) as pool:
+        while not stopping or pending:
+            # Keep the fetch threads busy; block only when there is no work.
+            while not stopping and len(pending) < fetch_threads * 2:
+                try:
+                    batch = inbox.get(block=not pending)
+                except queue.Empty:
+                    break
+                if batch is None:
+                    stopping = True
+                    break
+                dropped = 0
+                for url in batch:
+                    host = split_url(url).netloc.lower()
+                    rp = robots.get(host)
+                    if fetched >= max_pages:
+                        stats["over_limit"] += 1
+                        dropped += 1
+                    elif rp is not None and not rp.can_fetch(
+                        HEADERS["User-Agent"], url
+                    ):
+                        stats["robots_denied"] += 1
+                        dropped += 1
+                    else:
+                        fetched += 1
+                        pending[pool.submit(fetch, sess, url, budget)] = url
+                if dropped:
+                    control.put(("done", worker_id, dropped, []))
+            if not pending:
+                continue
+
+            done, _ = wait(pending, timeout=None, return_when=FIRST_COMPLETED)
+            for fut in done:
+                pending.pop(fut)
+                result = fut.result()
+                if result is None:
+                    stats["fetch_failed"] += 1
+                    control.put(("done", worker_id, 1, []))
+                    continue
+                final_url, text, body = result
+                t0 = time.perf_counter()
+                if cache is None:
+                    page = extract_page(text, final_url, allowed_set)
+                else:
+                    page = cache.get_or_extract(
+                        "spider",
+                        cache_version,
+                        final_url,
+                        body,
+                        lambda: extract_page(text, final_url, allowed_set),
+                    )
+                parse_seconds += time.perf_counter() - t0
+                out.write(schema.encode_line(page))
+                stats["pages"] += 1
+                control.put(("done", worker_id, 1, page["out_links"]))
+
+    if cache is not None:
+        stats["cache"] = cache.stats()
+        cache.close()
+    stats["parse_seconds"] = round(parse_seconds, 3)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["shard"] = str(shard)
+    control.put(("stats", worker_id, stats))
+
+
+def merge_shards(shards: list[Path], out: Path) -> int:
+    count = 0
+    with out.open("wb") as f:
+        for path in shards:
+            with path.open("rb") as src:
+                for line in src:
+                    f.write(line)
+                    count += 1
+    return count
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Crawl with N worker processes that each own a hash shard of the URLs."
+    )
+    ap.add_argument("--workers", type=int, default=mp.cpu_count())
+    ap.add_argument("--fetch-threads", type=int, default=4, help="per worker")
+    ap.add_argument("--start-url", action="append", default=[])
+    ap.add_argument("--allowed", action="append", default=[], help="allowed host")
+    ap.add_argument("--max-pages", type=int, default=100_000)
+    ap.add_argument("--out", type=Path, default=Path("raw/scrapy/pages.jsonl"))
+    ap.add_argument(
+        "--cache", default=str(extract_cache.DEFAULT_PATH), help="'' disables"
+    )
+    ap.add_argument("--keep-shards", action="store_true")
+    ap.add_argument("--no-robots", action="store_true")
+    # Same politeness as the spider, shared by all workers: the site 403s
+    # aggressive clients.
+    ap.add_argument(
+        "--delay",
+        type=float,
+        default=ZCFIndiaSpider.custom_settings["DOWNLOAD_DELAY"],
+        help="seconds between requests to a host, across all workers",
+    )
+    ap.add_argument(
+        "--per-host-concurrency",
+        type=int,
+        default=int(ZCFIndiaSpider.custom_settings["AUTOTHROTTLE_TARGET_CONCURRENCY"]),
+        help="requests in flight per host, across all workers",
+    )
+    args = ap.parse_args()
+
+    start_urls = args.start_url or ZCFIndiaSpider.start_urls
+    allowed = sorted(
+        {h.lower() for h in args.allowed}
+        or {d.lower() for d in ZCFIndiaSpider.allowed_domains}
+    )
+    shards = max(1, args.workers)
+    shard_dir = args.out.parent / f"{args.out.stem}.shards"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    robots = {} if args.no_robots else load_robots(set(allowed))
+    # Each worker's cache is its own SQLite file: no cross-process locking.
+    cache_dir = Path(args.cache).with_suffix("") if args.cache else None
+    # Each worker gets 1/shards of the host budget; a worker needs at least
+    # one request in flight, so more workers than slots exceed the cap.
+    host_concurrency = max(1, args.per_host_concurrency // shards)
+    if shards > args.per_host_concurrency:
+        print(
+            f"{shards} workers > --per-host-concurrency {args.per_host_concurrency}: "
+            f"up to {shards} requests per host in flight",
+            file=sys.stderr,
+        )
+
+    inboxes = [mp.Queue() for _ in range(shards)]
+    control = mp.Queue()
+    workers = [
+        mp.Process(
+            target=run_worker,
+            args=(
+                i,
+                inboxes[i],
+                control,
+                str(shard_dir),
+                allowed,
+                robots,
+                args.fetch_threads,
+                math.ceil(args.max_pages / shards),
+                str(cache_dir / f"shard{i:03d}.sqlite") if cache_dir else None,
+                host_concurrency,
+                args.delay * shards,
+                args.delay * i,
+            ),
+        )
+        for i in range(shards)
+    ]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+
+    routed: set[str] = set()
+
+    def route(links) -> int:
+        outbox: dict[int, list[str]] = {}
+        for link in links:
+            if link not in routed:
+                routed.add(link)
+                outbox.setdefault(shard_of(link, shards), []).append(link)
+        for owner, batch in outbox.items():
+            inboxes[owner].put(batch)
+        return sum(len(batch) for batch in outbox.values())
+
+    outstanding = route(normalize_url(u) for u in start_urls)
+    processed = 0
+    while outstanding > 0:
+        try:
+            msg = control.get(timeout=1.0)
+        except queue.Empty:
+            dead = [w for w in workers if w.exitcode not in (None, 0)]
+            if dead:
+                for w in workers:
+                    w.terminate()
+                print(
+                    f"worker exited with {dead[0].exitcode}; aborting",
+                    file=sys.stderr,
+                )
+                return 1
+            continue
+        _, _, done, links = msg
+        outstanding += route(links) - done
+        processed += done
+    for inbox in inboxes:
+        inbox.put(None)
+
+    per_worker = {}
+    while len(per_worker) < shards:
+        _, worker_id, stats = control.get()
+        per_worker[worker_id] = stats
+    for w in workers:
+        w.join()
+
+    shard_files = [Path(per_worker[i]["shard"]) for i in range(shards)]
+    pages = merge_shards(shard_files, args.out)
+    if not args.keep_shards:
+        for path in shard_files:
+            path.unlink()
+        if not any(shard_dir.iterdir()):
+            shard_dir.rmdir()
+
+    seconds = round(time.perf_counter() - started, 3)
+    parse_seconds = sum(s["parse_seconds"] for s in per_worker.values())
+    summary = {
+        "workers": shards,
+        "pages": pages,
+        "urls_routed": len(routed),
+        "urls_processed": processed,
+        "seconds": seconds,
+        "pages_per_second": round(pages / seconds, 2) if seconds else None,
+        "parse_seconds_total": round(parse_seconds, 3),
+        "per_host": {
+            "delay": args.delay,
+            "concurrency": host_concurrency * shards,
+        },
+        "out": str(args.out),
+        "per_worker": [per_worker[i] for i in range(shards)],
+    }
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
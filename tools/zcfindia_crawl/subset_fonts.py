@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import page_store
+import prune_css
+import schema
+from schema import PageRecord
+
+try:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+except ImportError:  # optional: the code-point report still runs without it
+    subset = None
+    TTFont = None
+
+
+FONT_SUFFIXES = {".woff", ".woff2", ".ttf", ".otf"}
+# Always keep printable ASCII so form input and late content still render.
+BASELINE = set(range(0x20, 0x7F))
+CSS_ESCAPE = re.compile(r"\\([0-9a-fA-F]{1,6})\s?|\\(.)")
+
+
+def text_codepoints(text_roots: list[Path], extra_files: list[Path], pages_jsonl: Path):
+    cps: set[int] = set()
+    for path in extra_files:
+        if page_store.exists(path):
+            cps.update(map(ord, page_store.read_text(path)))
+    for root in text_roots:
+        for rel in page_store.iter_files(root):
+            if rel.endswith(".txt"):
+                cps.update(map(ord, page_store.read_text(root / rel)))
+    if pages_jsonl.exists():
+        for rec in schema.iter_jsonl(pages_jsonl, PageRecord):
+            for value in (rec.title, rec.meta_description, rec.content_text):
+                if value:
+                    cps.update(map(ord, value))
+    return cps
+
+
+def css_content_codepoints(value: str) -> set[int]:
+    value = value.strip()
+    if len(value) < 2 or value[0] not in "\"'" or value[-1] != value[0]:
+        return set()
+
+    def unescape(m: re.Match) -> str:
+        if m.group(1):
+            return chr(int(m.group(1), 16))
+        return m.group(2)
+
+    return set(map(ord, CSS_ESCAPE.sub(unescape, value[1:-1])))
+
+
+def icon_codepoints(css_root: Path, index: prune_css.SelectorIndex) -> set[int]:
+    # `content: "\f518"` on rules whose selector can match a crawled page,
+    # i.e. the icon glyphs the site actually shows.
+    cps: set[int] = set()
+
+    def walk(blocks):
+        for prelude, body in blocks:
+            if body is None:
+                continue
+            if prelude.lower().startswith(prune_css.GROUPING_AT_RULES):
+                walk(prune_css.parse_blocks(body))
+            elif not prelude.startswith("@"):
+                decls = dict(prune_css.declarations(body))
+                if "content" not in decls:
+                    continue
+                if any(
+                    prune_css.selector_can_match(s, index)
+                    for s in prune_css.split_top_level(prelude)
+                ):
+                    cps.update(css_content_codepoints(decls["content"]))
+
+    for css_file in sorted(css_root.rglob("*.css")):
+        walk(
+            prune_css.parse_blocks(
+                css_file.read_text(encoding="utf-8", errors="replace")
+            )
+        )
+    return cps
+
+
+def glyph_key(cps: set[int]) -> str:
+    data = ",".join(f"{cp:x}" for cp in sorted(cps)).encode("ascii")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def subset_font(src: Path, dest: Path, cps: set[int]) -> None:
+    font = TTFont(src, lazy=False)
+    options = subset.Options()
+    options.flavor = font.flavor
+    options.layout_features = ["*"]
+    options.name_IDs = ["*"]
+    options.notdef_outline = True
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=cps)
+    subsetter.subset(font)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.tmp")
+    font.save(tmp)
+    tmp.replace(dest)
+
+
+def covered(src: Path, cps: set[int]) -> int:
+    font = TTFont(src, lazy=True)
+    return len(cps & set(font.getBestCmap() or {}))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Subset captured web fonts to the glyphs the site's text and icons use."
+    )
+    # Paths default to their place under --raw-dir (raw/ or raw/sites/<name>).
+    ap.add_argument("--raw-dir", type=Path, default=Path("raw"))
+    ap.add_argument("--fonts", type=Path, help="default: <raw-dir>/har_bodies")
+    ap.add_argument("--css-root", type=Path, help="default: <raw-dir>/har_bodies")
+    ap.add_argument(
+        "--text",
+        type=Path,
+        nargs="*",
+        help="default: <raw-dir>/content/live_pages and har_pages",
+    )
+    ap.add_argument(
+        "--pages-jsonl", type=Path, help="default: <raw-dir>/scrapy/pages.jsonl"
+    )
+    ap.add_argument("--out", type=Path, help="default: <raw-dir>/fonts_subset")
+    ap.add_argument(
+        "--report", type=Path, help="default: <raw-dir>/manifests/font_subset.json"
+    )
+    ap.add_argument("--no-baseline", action="store_true", help="drop printable ASCII")
+    args = ap.parse_args()
+
+    raw = args.raw_dir
+    args.fonts = args.fonts or raw / "har_bodies"
+    args.css_root = args.css_root or raw / "har_bodies"
+    if args.text is None:
+        args.text = [raw / "content" / "live_pages", raw / "content" / "har_pages"]
+    args.pages_jsonl = args.pages_jsonl or raw / "scrapy" / "pages.jsonl"
+    args.out = args.out or raw / "fonts_subset"
+    args.report = args.report or raw / "manifests" / "font_subset.json"
+
+    started = time.perf_counter()
+    text_cps = text_codepoints(
+        args.text, [raw / "content" / "all_live_page_text.md"], args.pages_jsonl
+    )
+    # Icon glyphs come from the CSS rules the pages' classes can match.
+    index, _ = prune_css.build_index(
+        args.text, args.pages_jsonl, list(prune_css.DEFAULT_SAFELIST)
+    )
+    icon_cps = icon_codepoints(args.css_root, index)
+    cps = text_cps | icon_cps | (set() if args.no_baseline else BASELINE)
+    cps = {cp for cp in cps if cp >= 0x20}
+    key = glyph_key(cps)
+
+    fonts = sorted(
+        p
+        for p in args.fonts.rglob("*")
+        if p.is_file() and p.suffix.lower() in FONT_SUFFIXES
+    )
+    if fonts and subset is None:
+        print(
+            "fontTools is not installed; run `uv pip install fonttools brotli`.",
+            file=sys.stderr,
+        )
+        return 1
+
+    cache_dir = args.out / ".cache"
+    results = []
+    for src in fonts:
+        digest = hashlib.sha256(src.read_bytes()).hexdigest()
+        cached = cache_dir / f"{digest[:32]}-{key}{src.suffix.lower()}"
+        hit = cached.exists()
+        if not hit:
+            try:
+                subset_font(src, cached, cps)
+            except Exception as e:
+                results.append({"font": str(src.as_posix()), "error": repr(e)})
+                continue
+        dest = args.out / src.relative_to(args.fonts)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(cached, dest)
+        before = src.stat().st_size
+        after = dest.stat().st_size
+        results.append(
+            {
+                "font": str(src.as_posix()),
+                "subset": str(dest.as_posix()),
+                "bytes_before": before,
+                "bytes_after": after,
+                "bytes_saved": before - after,
+                "codepoints_kept": covered(dest, cps),
+                "cached": hit,
+            }
+        )
+
+    ok = [r for r in results if "error" not in r]
+    report = {
+        "codepoints": len(cps),
+        "text_codepoints": len(text_cps),
+        "icon_codepoints": len(icon_cps),
+        "glyph_set": key,
+        "fonts": len(fonts),
+        "bytes_before": sum(r["bytes_before"] for r in ok),
+        "bytes_after": sum(r["bytes_after"] for r in ok),
+        "seconds": round(time.perf_counter() - started, 3),
+        "results": results,
+    }
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    args.report.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+import page_store
+import schema
+from schema import PageRecord, PageTextRecord
+from urls import canonical_route_path, url_to_rel_path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL,
+    url TEXT NOT NULL,
+    route TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS docs_source ON docs(source);
+CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5(
+    title, body, tokenize = 'porter unicode61 remove_diacritics 2'
+);
+"""
+# bm25 column weights: a hit in the title counts 5x a hit in the body.
+RANK = "bm25(fts, 5.0, 1.0)"
+# Text roots extract_har_to_raw.py writes: the manifest listing each page's
+# URL, and the .txt path it derives from that URL.
+TEXT_MANIFESTS = {
+    "live_pages": (
+        "live_pages.json",
+        lambda url: url_to_rel_path(url, default_ext=".html").with_suffix(".txt"),
+    ),
+    "har_pages": (
+        "har_page_text.json",
+        lambda url: url_to_rel_path(url, default_ext=".txt"),
+    ),
+}
+
+
+def connect(db: Path) -> sqlite3.Connection:
+    db.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def scrapy_docs(pages_jsonl: Path) -> Iterator[tuple[str, str, str | None, str]]:
+    if not pages_jsonl.exists():
+        return
+    for rec in schema.iter_jsonl(pages_jsonl, PageRecord):
+        if rec.content_text:
+            yield "scrapy", rec.url, rec.title, rec.content_text
+
+
+def source_name(root: Path) -> str:
+    # The resolved path, so two --text roots sharing a basename stay apart.
+    return root.resolve().as_posix()
+
+
+def manifest_urls(root: Path) -> dict[str, str]:
+    # rel .txt path -> page URL, from the manifest in <raw>/manifests/. Query
+    # strings only survive as a hash in the file name, so the manifest is the
+    # only way back to the real URL.
+    if root.name not in TEXT_MANIFESTS:
+        return {}
+    name, rel_path = TEXT_MANIFESTS[root.name]
+    manifest = root.parent.parent / "manifests" / name
+    return {
+        rel_path(rec.url).as_posix(): rec.url
+        for rec in schema.read_manifest(manifest, PageTextRecord)
+    }
+
+
+def text_docs(root: Path) -> Iterator[tuple[str, str, str | None, str]]:
+    # <root>/<host>/<path>/index.txt, as written by extract_har_to_raw.py.
+    # Files the manifest does not list get a URL rebuilt from their path.
+    urls = manifest_urls(root)
+    source = source_name(root)
+    for rel in page_store.iter_files(root):
+        if not rel.endswith(".txt"):
+            continue
+        url = urls.get(rel)
+        if url is None:
+            host, _, path = rel.removesuffix(".txt").partition("/")
+            if path == "index" or path.endswith("/index"):
+                path = path[: -len("index")]
+            url = f"https://{host}/{path}"
+        yield source, url, None, page_store.read_text(root / rel)
+
+
+def update(conn: sqlite3.Connection, docs, sources: set[str]) -> dict:
+    # Only routes whose (title, body) digest changed are rewritten; routes a
+    # scanned source no longer yields are dropped.
+    known = {
+        key: (doc_id, digest, source)
+        for doc_id, key, digest, source in conn.execute(
+            "SELECT id, key, digest, source FROM docs"
+        )
+    }
+    seen: set[str] = set()
+    stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+    now = time.time()
+    with conn:
+        for source, url, title, body in docs:
+            key = f"{source}:{url}"
+            if key in seen:
+                continue
+            seen.add(key)
+            digest = hashlib.sha256(
+                f"{title or ''}\0{body}".encode("utf-8")
+            ).hexdigest()
+            old = known.get(key)
+            if old and old[1] == digest:
+                stats["unchanged"] += 1
+                continue
+            if old:
+                conn.execute("DELETE FROM fts WHERE rowid = ?", (old[0],))
+                conn.execute(
+                    "UPDATE docs SET digest = ?, updated_at = ? WHERE id = ?",
+                    (digest, now, old[0]),
+                )
+                doc_id = old[0]
+                stats["updated"] += 1
+            else:
+                doc_id = conn.execute(
+                    "INSERT INTO docs (key, source, url, route, digest, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, source, url, canonical_route_path(url), digest, now),
+                ).lastrowid
+                stats["added"] += 1
+            conn.execute(
+                "INSERT INTO fts (rowid, title, body) VALUES (?, ?, ?)",
+                (doc_id, title or "", body),
+            )
+        for key, (doc_id, _, source) in known.items():
+            if key not in seen and source in sources:
+                conn.execute("DELETE FROM fts WHERE rowid = ?", (doc_id,))
+                conn.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+                stats["removed"] += 1
+    return stats
+
+
+def to_match(query: str) -> str:
+    # Plain words become quoted terms so punctuation cannot break FTS5 syntax.
+    terms = [t.replace('"', '""') for t in query.split()]
+    return " ".join(f'"{t}"' for t in terms)
+
+
+def search(
+    conn: sqlite3.Connection, query: str, limit: int, raw: bool, source: str | None
+) -> list[dict]:
+    sql = f"""
+        SELECT d.route, d.url, d.source, {RANK} AS score,
+               snippet(fts, 1, '[', ']', '…', 12) AS snippet
+        FROM fts JOIN docs d ON d.id = fts.rowid
+        WHERE fts MATCH ? {"AND (d.source = ? OR d.source GLOB ?)" if source else ""}
+        ORDER BY score
+        LIMIT ?
+    """
+    params = [query if raw else to_match(query)]
+    if source:
+        # A text root's basename picks every root of that name.
+        params += [source, f"*/{source}"]
+    params.append(limit * 4)
+    hits: dict[str, dict] = {}
+    for route, url, src, score, snip in conn.execute(sql, params):
+        # Same route from several sources: keep the best-ranked one.
+        if route not in hits:
+            hits[route] = {
+                "route": route,
+                "url": url,
+                "source": src,
+                "score": round(-score, 3),
+                "snippet": " ".join(snip.split()),
+            }
+        if len(hits) == limit:
+            break
+    return list(hits.values())
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="BM25 full-text index over extracted text."
+    )
+    ap.add_argument("--db", type=Path, default=Path("raw/text_index.sqlite"))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_update = sub.add_parser("update")
+    p_update.add_argument(
+        "--pages-jsonl", type=Path, default=Path("raw/scrapy/pages.jsonl")
+    )
+    p_update.add_argument(
+        "--text",
+        type=Path,
+        nargs="*",
+        default=[Path("raw/content/live_pages"), Path("raw/content/har_pages")],
+    )
+    # FTS5's automerge keeps routine updates cheap; a full merge rewrites the
+    # whole index, so it is only worth it after a bulk load.
+    p_update.add_argument(
+        "--optimize", action="store_true", help="fully merge the index afterwards"
+    )
+
+    p_query = sub.add_parser("query")
+    p_query.add_argument("query")
+    p_query.add_argument("--limit", type=int, default=20)
+    p_query.add_argument(
+        "--source", help="scrapy, a --text root, or its basename (live_pages, ...)"
+    )
+    p_query.add_argument("--raw", action="store_true", help="pass FTS5 syntax through")
+    p_query.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    conn = connect(args.db)
+    try:
+        if args.cmd == "update":
+            sources = {"scrapy"} if args.pages_jsonl.exists() else set()
+            sources |= {source_name(root) for root in args.text}
+            # Indexes built before sources were paths keyed them by basename.
+            sources |= {root.name for root in args.text}
+
+            def docs():
+                yield from scrapy_docs(args.pages_jsonl)
+                for root in args.text:
+                    yield from text_docs(root)
+
+            stats = update(conn, docs(), sources)
+            if args.optimize:
+                conn.execute("INSERT INTO fts (fts) VALUES ('optimize')")
+            conn.commit()
+            stats["documents"] = conn.execute("SELECT count(*) FROM docs").fetchone()[0]
+            stats["seconds"] = round(time.perf_counter() - started, 3)
+            print(json.dumps(stats, indent=2))
+            return 0
+
+        try:
+            hits = search(conn, args.query, args.limit, args.raw, args.source)
+        except sqlite3.OperationalError as e:
+            print(f"bad query: {e}", file=sys.stderr)
+            return 2
+        elapsed = (time.perf_counter() - started) * 1000
+        if args.json:
+            print(json.dumps(hits, indent=2, ensure_ascii=False))
+            return 0
+        for hit in hits:
+            print(f"{hit['score']:>8.3f}  {hit['route']:<40} {hit['snippet']}")
+        print(f"{len(hits)} pages in {elapsed:.1f} ms", file=sys.stderr)
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from hashlib import sha1
+from pathlib import Path
+from typing import Iterable, Iterator
+from urllib.parse import SplitResult, urljoin, urlsplit, urlunsplit
+
+
+# Header, footer and menu links repeat on every page, so a few thousand
+# entries cover a site; the bound keeps 10^5-route crawls from growing it.
+CACHE_SIZE = 65536
+
+
+def safe_segment(value: str) -> str:
+    value = value.strip()
+    if not value:
+        return "_"
+    value = re.sub(r"[^A-Za-z0-9._-]+", "_", value)
+    return value[:180] or "_"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def split_url(url: str) -> SplitResult:
+    return urlsplit(url)
+
+
+def join_url(base: str, href: str) -> str:
+    # Absolute links are the common case and do not depend on the page URL;
+    # only ones with dot segments ("/./", "/../") need resolving.
+    if href.startswith(("http://", "https://")) and "/." not in href:
+        return href
+    return _join(base, href)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _join(base: str, href: str) -> str:
+    url = urljoin(base, href)
+    u = split_url(url)
+    if "/." not in u.path:
+        return url
+    # urljoin leaves an absolute href on another host as it is, dot segments
+    # included; resolving the path against "/" removes them.
+    path = urlsplit(urljoin("http://_/", u.path)).path
+    return urlunsplit(u._replace(path=path))
+
+
+def _route_path(path: str) -> str:
+    path = path or "/"
+    # normalize trailing slash for route-like URLs
+    if "." not in path.rsplit("/", 1)[-1] and not path.endswith("/"):
+        path += "/"
+    return path
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_url(url: str) -> str:
+    # Route form used by the spider: https, lower-case host, query kept.
+    u = split_url(url)
+    return urlunsplit(
+        ("https", (u.netloc or "").lower(), _route_path(u.path), u.query, "")
+    )
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_base_url(url: str) -> str:
+    # Route form used by the HAR extractor: like normalize_url without the query.
+    u = split_url(url)
+    return urlunsplit(("https", u.netloc.lower(), _route_path(u.path), "", ""))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_asset_url(url: str) -> str:
+    # Asset form: paths are left alone so extension-less files keep their name.
+    u = split_url(url)
+    return urlunsplit(("https", u.netloc.lower(), u.path or "/", u.query, ""))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def strip_fragment(url: str) -> str | None:
+    # Absolute http(s) URL without its fragment, or None for other schemes.
+    u = split_url(url)
+    if u.scheme not in {"http", "https"}:
+        return None
+    return urlunsplit((u.scheme, u.netloc, u.path or "/", u.query, ""))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def path_suffix(path: str) -> str:
+    return Path(path).suffix.lower()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonical_route_path(url: str) -> str:
+    return _route_path(split_url(url).path)
+
+
+def match_host(netloc: str, hosts: Iterable[str]) -> str | None:
+    # The configured host a response host belongs to: itself, else the most
+    # specific host it is a subdomain of (apex -> www. redirects), else the
+    # www. host of a bare apex. Ports must agree.
+    netloc = netloc.lower()
+    if netloc in hosts:
+        return netloc
+    name, _, port = netloc.partition(":")
+    best = None
+    for host in hosts:
+        h, _, p = host.partition(":")
+        if p == port and (name.endswith(f".{h}") or h == f"www.{name}"):
+            if best is None or len(host) > len(best):
+                best = host
+    return best
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def url_to_rel_path(url: str, default_ext: str | None = None) -> Path:
+    parsed = split_url(url)
+    host = safe_segment(parsed.netloc.lower() or "unknown_host")
+    path = parsed.path or "/"
+    if path.endswith("/"):
+        path = f"{path}index"
+    p = Path(path.lstrip("/"))
+    if not p.name:
+        p = Path("index")
+    suffix = p.suffix
+    if not suffix and default_ext:
+        p = p.with_suffix(default_ext)
+    if parsed.query:
+        q_hash = sha1(parsed.query.encode("utf-8")).hexdigest()[:8]
+        p = p.with_name(f"{safe_segment(p.stem)}__q_{q_hash}{p.suffix}")
+    return Path(host) / p
+
+
+class UrlTable:
+    """Interns URL strings to dense integer IDs.
+
+    Seen-sets and frontiers hold the IDs, so membership checks hash a small
+    int and every distinct URL string is stored once however often it is
+    linked.
+    """
+
+    def __init__(self, urls: Iterable[str] = ()):
+        self._ids: dict[str, int] = {}
+        self._urls: list[str] = []
+        for url in urls:
+            self.intern(url)
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._urls)
+
+    def intern(self, url: str) -> int:
+        uid = self._ids.get(url)
+        if uid is None:
+            uid = self._ids[url] = len(self._urls)
+            self._urls.append(url)
+        return uid
+
+    def get(self, url: str) -> int | None:
+        return self._ids.get(url)
+
+    def url(self, uid: int) -> str:
+        return self._urls[uid]
+
+    def urls(self, ids: Iterable[int]) -> list[str]:
+        return [self._urls[i] for i in ids]
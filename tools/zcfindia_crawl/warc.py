@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import argparse
+import base64
+import gzip
+import hashlib
+import sys
+import uuid
+from datetime import datetime, timezone
+from http import HTTPStatus
+from pathlib import Path
+from typing import Iterable
+
+from urls import split_url
+
+
+# Stdlib only: extract_har_to_raw.py imports this module too.
+
+CDX_HEADER = " CDX N b a m s k r M S V g\n"
+# Bodies are stored decoded, so the transfer headers no longer describe them.
+DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+
+def surt(url: str) -> str:
+    u = split_url(url)
+    host, _, port = u.netloc.lower().split("@")[-1].partition(":")
+    if host.startswith("www."):
+        host = host[4:]
+    key = ",".join(reversed(host.split(".")))
+    if port and port not in {"80", "443"}:
+        key += f":{port}"
+    key += ")" + (u.path or "/").lower()
+    if u.query:
+        key += "?" + "&".join(sorted(u.query.lower().split("&")))
+    return key.replace(" ", "%20")
+
+
+def warc_date(when: datetime | None = None) -> str:
+    when = (when or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return when.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def cdx_timestamp(date: str) -> str:
+    return date.replace("-", "").replace("T", "").replace(":", "").rstrip("Z")
+
+
+def sha1_b32(data: bytes) -> str:
+    return base64.b32encode(hashlib.sha1(data).digest()).decode("ascii")
+
+
+def cdx_path_for(warc_path: Path) -> Path:
+    return warc_path.with_name(warc_path.name.removesuffix(".gz") + ".cdx")
+
+
+def _header_block(first_line: str, headers: Iterable[tuple[str, str]]) -> bytes:
+    lines = [first_line] + [f"{k}: {v}" for k, v in headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8", errors="replace")
+
+
+# Appends one gzip member per record so any record can be decompressed on its
+# own from (offset, length). The CDX lines are collected in memory (about 200
+# bytes per capture) and written sorted by close().
+class WarcWriter:
+    def __init__(self, path: Path, software: str = "zcf-crawl"):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = path.open("wb")
+        self._cdx: list[bytes] = []
+        info = f"software: {software}\r\nformat: WARC File Format 1.0\r\n".encode()
+        self._write(
+            [
+                ("WARC-Type", "warcinfo"),
+                ("WARC-Date", warc_date()),
+                ("WARC-Filename", path.name),
+                ("Content-Type", "application/warc-fields"),
+            ],
+            info,
+        )
+
+    def __len__(self) -> int:
+        return len(self._cdx)
+
+    def _write(
+        self, warc_headers: list[tuple[str, str]], block: bytes
+    ) -> tuple[int, int]:
+        headers = [
+            *warc_headers,
+            ("WARC-Record-ID", f"<urn:uuid:{uuid.uuid4()}>"),
+            ("WARC-Block-Digest", f"sha1:{sha1_b32(block)}"),
+            ("Content-Length", str(len(block))),
+        ]
+        record = _header_block("WARC/1.0", headers) + block + b"\r\n\r\n"
+        offset = self._fh.tell()
+        self._fh.write(gzip.compress(record, compresslevel=6, mtime=0))
+        return offset, self._fh.tell() - offset
+
+    def write_response(
+        self,
+        url: str,
+        status: int,
+        headers: Iterable[tuple[str, str]],
+        body: bytes,
+        mime: str = "",
+        fetched_at: datetime | None = None,
+    ) -> None:
+        kept = [(k, v) for k, v in headers if k.lower() not in DROP_HEADERS]
+        kept.append(("Content-Length", str(len(body))))
+        try:
+            reason = HTTPStatus(status).phrase
+        except ValueError:
+            reason = ""
+        block = _header_block(f"HTTP/1.1 {status} {reason}".rstrip(), kept) + body
+        date = warc_date(fetched_at)
+        digest = sha1_b32(body)
+        offset, length = self._write(
+            [
+                ("WARC-Type", "response"),
+                ("WARC-Date", date),
+                ("WARC-Target-URI", url),
+                ("WARC-Payload-Digest", f"sha1:{digest}"),
+                ("Content-Type", "application/http; msgtype=response"),
+            ],
+            block,
+        )
+        mime = (mime or "").split(";")[0].strip().lower() or "unk"
+        self._cdx.append(
+            " ".join(
+                [
+                    surt(url),
+                    cdx_timestamp(date),
+                    url.replace(" ", "%20"),
+                    mime,
+                    str(status),
+                    digest,
+                    "-",
+                    "-",
+                    str(length),
+                    str(offset),
+                    self.path.name,
+                ]
+            ).encode("utf-8")
+            + b"\n"
+        )
+
+    def close(self) -> Path:
+        self._fh.close()
+        cdx = cdx_path_for(self.path)
+        with cdx.open("wb") as out:
+            out.write(CDX_HEADER.encode("ascii"))
+            out.writelines(sorted(self._cdx))
+        return cdx
+
+
+def _seek_first(f, key: bytes) -> None:
+    # Binary search over byte offsets of the sorted CDX file; leaves f at the
+    # first line >= key without reading the lines before it.
+    lo, hi = 0, f.seek(0, 2)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        f.seek(mid)
+        if mid:
+            f.readline()
+        line = f.readline()
+        if not line or line >= key:
+            hi = mid
+        else:
+            lo = mid + 1
+    f.seek(lo)
+    if lo:
+        f.readline()
+
+
+def cdx_lookup(cdx: Path, url: str) -> list[list[str]]:
+    key = f"{surt(url)} ".encode("utf-8")
+    rows: list[list[str]] = []
+    with cdx.open("rb") as f:
+        _seek_first(f, key)
+        for line in f:
+            if not line.startswith(key):
+                break
+            rows.append(line.decode("utf-8").split())
+    return rows
+
+
+def read_record(warc_path: Path, offset: int, length: int) -> tuple[int, list, bytes]:
+    with warc_path.open("rb") as f:
+        f.seek(offset)
+        record = gzip.decompress(f.read(length))
+    _, _, rest = record.partition(b"\r\n\r\n")
+    http_head, _, body = rest.partition(b"\r\n\r\n")
+    lines = http_head.decode("utf-8", errors="replace").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = [tuple(line.split(": ", 1)) for line in lines[1:] if ": " in line]
+    # Drop the record terminator.
+    return status, headers, body[:-4]
+
+
+def fetch_capture(
+    cdx: Path, url: str, timestamp: str | None = None
+) -> tuple[list[str], int, list, bytes] | None:
+    # Closest capture to `timestamp` (any prefix of YYYYMMDDhhmmss), else the latest.
+    rows = cdx_lookup(cdx, url)
+    if not rows:
+        return None
+    if timestamp:
+        target = int(timestamp.ljust(14, "0")[:14])
+        row = min(rows, key=lambda r: abs(int(r[1]) - target))
+    else:
+        row = rows[-1]
+    status, headers, body = read_record(cdx.parent / row[10], int(row[9]), int(row[8]))
+    return row, status, headers, body
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Look up a capture in a WARC via its CDX.")
+    ap.add_argument("cdx", type=Path)
+    ap.add_argument("url")
+    ap.add_argument("--at", help="timestamp prefix, e.g. 20240131")
+    ap.add_argument("--body", action="store_true", help="write the body to stdout")
+    args = ap.parse_args()
+
+    hit = fetch_capture(args.cdx, args.url, args.at)
+    if hit is None:
+        print(f"{args.url} not in {args.cdx}", file=sys.stderr)
+        return 1
+    row, status, headers, body = hit
+    if args.body:
+        sys.stdout.buffer.write(body)
+        return 0
+    print(f"{row[1]} {status} {row[2]} ({len(body)} bytes)")
+    for k, v in headers:
+        print(f"{k}: {v}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,12 +2,30 @@ from __future__ import annotations
 
 import json
 import re
-from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
 from typing import Iterable
-from urllib.parse import urljoin, urlsplit, urlunsplit
 
+import bs4
+import lxml.etree
 import scrapy
 from bs4 import BeautifulSoup
+from scrapy.exporters import BaseItemExporter
+
+import extract_cache
+import schema
+import urls
+from extract_cache import ExtractCache, extractor_version
+from schema import PageRecord
+from urls import (
+    CACHE_SIZE,
+    UrlTable,
+    join_url,
+    match_host,
+    normalize_url,
+    split_url,
+)
+from warc import WarcWriter
 
 
 SKIP_EXTENSIONS = {
@@ -40,27 +58,17 @@ SKIP_EXTENSIONS = {
 }
 
 
-def normalize_url(url: str) -> str:
-    u = urlsplit(url)
-    scheme = "https"
-    netloc = (u.netloc or "").lower()
-    path = u.path or "/"
-    # normalize trailing slash for route-like URLs
-    if "." not in path.split("/")[-1] and not path.endswith("/"):
-        path += "/"
-    return urlunsplit((scheme, netloc, path, u.query, ""))
-
-
 def is_internal(url: str, allowed: set[str]) -> bool:
     try:
-        u = urlsplit(url)
+        u = split_url(url)
     except Exception:
         return False
     return (u.netloc or "").lower() in allowed
 
 
+@lru_cache(maxsize=CACHE_SIZE)
 def should_skip_link(url: str) -> bool:
-    u = urlsplit(url)
+    u = split_url(url)
     ext = (u.path or "").lower()
     dot = ext.rsplit(".", 1)
     if len(dot) == 2:
@@ -140,7 +148,7 @@ def extract_image_urls(soup: BeautifulSoup, base_url: str) -> list[str]:
                     candidates.append(u)
 
         for src in candidates:
-            abs_url = urljoin(base_url, src)
+            abs_url = join_url(base_url, src)
             if abs_url.startswith("http"):
                 urls.append(abs_url)
 
@@ -209,20 +217,133 @@ def page_kind(path: str, body_class: str) -> str:
     return "unknown"
 
 
-@dataclass
-class PageRecord:
-    url: str
-    path: str
-    kind: str
-    title: str | None
-    meta_description: str | None
-    published_time: str | None
-    modified_time: str | None
-    primary_image: str | None
-    images: list[str]
-    content_html: str | None
-    content_text: str | None
-    out_links: list[str]
+def extract_page(html: str, base: str, allowed: set[str]) -> dict:
+    soup = BeautifulSoup(html, "lxml")
+    title = soup.title.get_text(" ", strip=True) if soup.title else None
+    meta_desc = None
+    md = soup.find("meta", attrs={"name": "description"})
+    if md and md.get("content"):
+        meta_desc = str(md.get("content")).strip() or None
+
+    pub = None
+    mod = None
+    m1 = soup.find("meta", attrs={"property": "article:published_time"})
+    m2 = soup.find("meta", attrs={"property": "article:modified_time"})
+    if m1 and m1.get("content"):
+        pub = str(m1.get("content")).strip() or None
+    if m2 and m2.get("content"):
+        mod = str(m2.get("content")).strip() or None
+
+    json_ld = extract_json_ld(soup)
+    primary_img = find_first_image_url(json_ld)
+
+    container = pick_main_container(soup)
+    content_html = None
+    content_text = None
+    if container is not None:
+        content_html = str(container)
+        content_text = extract_content_text(container)
+
+    images: list[str] = []
+    images.extend(extract_image_urls(soup, base))
+    if primary_img:
+        images.insert(0, primary_img)
+    # de-dupe keep order
+    seen = set()
+    images2 = []
+    for u in images:
+        nu = normalize_url(u)
+        if nu in seen:
+            continue
+        seen.add(nu)
+        images2.append(nu)
+
+    body_class = ""
+    b = soup.body
+    if b and b.get("class"):
+        body_class = " ".join([str(c) for c in b.get("class") if c])
+
+    path = split_url(base).path or "/"
+    kind = page_kind(path, body_class)
+
+    out_links: list[str] = []
+    for a in soup.select("a[href]"):
+        href = a.get("href")
+        if not href:
+            continue
+        abs_url = join_url(base, href)
+        if not abs_url.startswith("http"):
+            continue
+        if should_skip_link(abs_url):
+            continue
+        if not is_internal(abs_url, allowed):
+            continue
+        out_links.append(normalize_url(abs_url))
+
+    rec = PageRecord(
+        url=normalize_url(base),
+        path=path,
+        kind=kind,
+        title=title,
+        meta_description=meta_desc,
+        published_time=pub,
+        modified_time=mod,
+        primary_image=normalize_url(primary_img) if primary_img else None,
+        images=images2[:50],
+        content_html=content_html,
+        content_text=(
+            "\n".join(content_text.splitlines()[:400]) if content_text else None
+        ),
+        out_links=out_links,
+    )
+    return schema.to_dict(rec)
+
+
+# Any edit to the extraction code, or a bs4/lxml upgrade, changes the
+# version, so cached pages are re-extracted rather than served stale.
+EXTRACTOR_VERSION = extractor_version(
+    extract_page,
+    pick_main_container,
+    extract_content_text,
+    extract_image_urls,
+    extract_json_ld,
+    find_first_image_url,
+    page_kind,
+    should_skip_link,
+    is_internal,
+    PageRecord,
+    urls,
+    repr(sorted(SKIP_EXTENSIONS)),
+    f"bs4 {bs4.__version__} lxml {lxml.etree.__version__}",
+)
+
+
+class MsgspecJsonLinesExporter(BaseItemExporter):
+    # Drop-in for the "jsonlines" feed format that encodes with msgspec.
+    def __init__(self, file, **kwargs):
+        super().__init__(dont_fail=True, **kwargs)
+        self.file = file
+
+    def export_item(self, item) -> None:
+        self.file.write(schema.encode_line(item))
+
+
+class HostItemFilter:
+    # FEEDS item_filter that routes pages to a per-site feed, e.g.
+    # {"out/a/pages.jsonl": {"format": "jsonlines", "item_filter": HostItemFilter,
+    #                        "hosts": ["a.org", "www.a.org"],
+    #                        "other_hosts": ["b.org", "blog.a.org"]}}
+    # Hosts outside the config (a redirect to www.) go to the site whose host
+    # they match most specifically, as in ZCFIndiaSpider.parse.
+    def __init__(self, feed_options: dict | None):
+        options = feed_options or {}
+        self.hosts = {h.lower() for h in options.get("hosts", [])}
+        other = {h.lower() for h in options.get("other_hosts", [])}
+        self.all_hosts = self.hosts | other
+
+    def accepts(self, item) -> bool:
+        host = match_host(split_url(item["url"]).netloc, self.all_hosts)
+        return host in self.hosts
 
 
 class ZCFIndiaSpider(scrapy.Spider):
@@ -250,91 +371,114 @@ class ZCFIndiaSpider(scrapy.Spider):
         "AUTOTHROTTLE_START_DELAY": 0.25,
         "AUTOTHROTTLE_MAX_DELAY": 4.0,
         "LOG_LEVEL": "INFO",
+        "EXTRACT_CACHE": str(extract_cache.DEFAULT_PATH),
+        "EXTRACT_CACHE_MB": 512,
+        "FEED_EXPORTERS": {
+            "jsonlines": "zcfindia_spider.MsgspecJsonLinesExporter",
+            "jsonl": "zcfindia_spider.MsgspecJsonLinesExporter",
+        },
     }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Menu/footer links show up on every page; only the first sighting
+        # becomes a Request, the rest are an int set lookup.
+        self.url_table = UrlTable()
+        self.scheduled: set[int] = set()
+        self.warc: WarcWriter | None = None
+        self.extract_cache: ExtractCache | None = None
+        # host -> hosts of the same site; links are only followed within a site.
+        self.site_hosts: dict[str, set[str]] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # e.g. -s WARC_PATH=raw/warc/spider.warc.gz; the CDX index is written
+        # next to it when the spider closes.
+        warc_path = crawler.settings.get("WARC_PATH")
+        if warc_path:
+            spider.warc = WarcWriter(Path(warc_path))
+        # SITES (set by crawl_sites.py): [{"name", "hosts", "start_urls"}, ...]
+        # crawled together over one downloader.
+        sites = crawler.settings.getlist("SITES")
+        if sites:
+            for site in sites:
+                hosts = {h.lower() for h in site["hosts"]}
+                for host in hosts:
+                    spider.site_hosts[host] = hosts
+            # OffsiteMiddleware matches host names without the port.
+            spider.allowed_domains = sorted(
+                {h.split(":")[0] for h in spider.site_hosts}
+            )
+            spider.start_urls = [u for site in sites for u in site["start_urls"]]
+        # Unchanged HTML skips parsing; -s EXTRACT_CACHE= turns it off.
+        cache_path = crawler.settings.get("EXTRACT_CACHE")
+        if cache_path:
+            spider.extract_cache = ExtractCache(
+                Path(cache_path),
+                max_bytes=crawler.settings.getint("EXTRACT_CACHE_MB") * 1024 * 1024,
+            )
+        return spider
+
+    def closed(self, reason: str) -> None:
+        if self.warc is not None:
+            self.warc.close()
+        if self.extract_cache is not None:
+            self.logger.info("extract cache: %s", self.extract_cache.stats())
+            self.extract_cache.close()
+
+    def allowed_hosts(self, netloc: str) -> set[str]:
+        if not self.site_hosts:
+            return {d.lower() for d in self.allowed_domains}
+        if netloc in self.site_hosts:
+            return self.site_hosts[netloc]
+        host = match_host(netloc, self.site_hosts)
+        if host is None:
+            # Kept out of every site's pages.jsonl by HostItemFilter.
+            self.logger.warning("%s matches no site's hosts", netloc)
+            self.crawler.stats.inc_value("sites/unmatched_host")
+            return {netloc}
+        # Joins that site from now on, so its links are followed too.
+        hosts = self.site_hosts[host]
+        hosts.add(netloc)
+        self.site_hosts[netloc] = hosts
+        self.logger.info("%s assigned to the site of %s", netloc, host)
+        return hosts
+
+    def archive(self, response: scrapy.http.Response) -> None:
+        headers = [
+            (k.decode("latin-1"), v.decode("latin-1"))
+            for k, values in response.headers.items()
+            for v in values
+        ]
+        self.warc.write_response(
+            response.url,
+            response.status,
+            headers,
+            response.body,
+            mime=response.headers.get("Content-Type", b"").decode("latin-1"),
+        )
+
     def parse(self, response: scrapy.http.Response):
-        allowed = {d.lower() for d in self.allowed_domains}
+        if self.warc is not None:
+            self.archive(response)
         base = response.url
-
-        soup = BeautifulSoup(response.text, "lxml")
-        title = soup.title.get_text(" ", strip=True) if soup.title else None
-        meta_desc = None
-        md = soup.find("meta", attrs={"name": "description"})
-        if md and md.get("content"):
-            meta_desc = str(md.get("content")).strip() or None
-
-        pub = None
-        mod = None
-        m1 = soup.find("meta", attrs={"property": "article:published_time"})
-        m2 = soup.find("meta", attrs={"property": "article:modified_time"})
-        if m1 and m1.get("content"):
-            pub = str(m1.get("content")).strip() or None
-        if m2 and m2.get("content"):
-            mod = str(m2.get("content")).strip() or None
-
-        json_ld = extract_json_ld(soup)
-        primary_img = find_first_image_url(json_ld)
-
-        container = pick_main_container(soup)
-        content_html = None
-        content_text = None
-        if container is not None:
-            content_html = str(container)
-            content_text = extract_content_text(container)
-
-        images: list[str] = []
-        images.extend(extract_image_urls(soup, base))
-        if primary_img:
-            images.insert(0, primary_img)
-        # de-dupe keep order
-        seen = set()
-        images2 = []
-        for u in images:
-            nu = normalize_url(u)
-            if nu in seen:
-                continue
-            seen.add(nu)
-            images2.append(nu)
-
-        body_class = ""
-        b = soup.body
-        if b and b.get("class"):
-            body_class = " ".join([str(c) for c in b.get("class") if c])
-
-        path = urlsplit(base).path or "/"
-        kind = page_kind(path, body_class)
-
-        out_links: list[str] = []
-        for a in soup.select("a[href]"):
-            href = a.get("href")
-            if not href:
-                continue
-            abs_url = urljoin(base, href)
-            if not abs_url.startswith("http"):
-                continue
-            if should_skip_link(abs_url):
+        allowed = self.allowed_hosts(split_url(base).netloc.lower())
+        if self.extract_cache is None:
+            page = extract_page(response.text, base, allowed)
+        else:
+            page = self.extract_cache.get_or_extract(
+                "spider",
+                f"{EXTRACTOR_VERSION}:{','.join(sorted(allowed))}",
+                base,
+                response.body,
+                lambda: extract_page(response.text, base, allowed),
+            )
+        yield page
+
+        for link in page["out_links"]:
+            link_id = self.url_table.intern(link)
+            if link_id in self.scheduled:
                 continue
-            if not is_internal(abs_url, allowed):
-                continue
-            out_links.append(normalize_url(abs_url))
-
-        rec = PageRecord(
-            url=normalize_url(base),
-            path=(urlsplit(base).path or "/"),
-            kind=kind,
-            title=title,
-            meta_description=meta_desc,
-            published_time=pub,
-            modified_time=mod,
-            primary_image=normalize_url(primary_img) if primary_img else None,
-            images=images2[:50],
-            content_html=content_html,
-            content_text=(
-                "\n".join(content_text.splitlines()[:400]) if content_text else None
-            ),
-            out_links=out_links,
-        )
-        yield asdict(rec)
-
-        for link in out_links:
+            self.scheduled.add(link_id)
             yield response.follow(link, callback=self.parse)